@@ -0,0 +1,148 @@
+import heapq
+from io import BytesIO
+
+import numpy as np
+
+
+# Running per-class statistics over a stream of detection results.
+# Everything is kept in fixed-size arrays, so memory does not grow with video length.
+class DetectionAggregator:
+    def __init__(self, class_names, conf_bins=10, max_timeline=512, top_k=0):
+        self.class_names = class_names
+        self.num_classes = len(class_names)
+        self.conf_bins = conf_bins
+        self.max_timeline = max_timeline + max_timeline % 2
+        self.top_k = top_k
+
+        self.frames = 0
+        self.class_counts = np.zeros(self.num_classes, dtype=np.int64)
+        self.conf_sums = np.zeros(self.num_classes, dtype=np.float64)
+        self.conf_hist = np.zeros((self.num_classes, conf_bins), dtype=np.int64)
+
+        # Timeline buckets; each covers `_bucket_width` frames and is halved in resolution when full
+        self._timeline_sums = np.zeros(self.max_timeline, dtype=np.int64)
+        self._timeline_frames = np.zeros(self.max_timeline, dtype=np.int64)
+        self._bucket_width = 1
+
+        self._crops = []  # min-heap of (conf, seq, label, crop)
+        self._seq = 0  # tie-breaker so equal confidences never compare crops; a plain int pickles cleanly
+        self._last_result = None
+        self._last_arrays = None
+
+    def __getstate__(self):
+        # Don't drag the last Results object (and its tensors) into pickles
+        state = self.__dict__.copy()
+        state["_last_result"] = None
+        state["_last_arrays"] = None
+        return state
+
+    @property
+    def total(self):
+        return int(self.class_counts.sum())
+
+    def update(self, result, frame=None):
+        # Frames skipped by a sampler hand in the same Results object again; reuse its arrays
+        repeated = result is self._last_result
+        if repeated:
+            xyxy, cls, conf = self._last_arrays
+        else:
+            boxes = result.boxes
+            data = boxes.data.cpu().numpy() if len(boxes) else np.zeros((0, 6), dtype=np.float32)
+            xyxy, conf, cls = data[:, :4], data[:, -2], data[:, -1].astype(np.int64)
+            self._last_result = result
+            self._last_arrays = (xyxy, cls, conf)
+
+        if len(cls):
+            self.class_counts += np.bincount(cls, minlength=self.num_classes)[:self.num_classes]
+            self.conf_sums += np.bincount(cls, weights=conf, minlength=self.num_classes)[:self.num_classes]
+            bins = np.minimum((conf * self.conf_bins).astype(np.int64), self.conf_bins - 1)
+            np.add.at(self.conf_hist, (cls, bins), 1)
+            if self.top_k and frame is not None and not repeated:
+                self._collect_crops(frame, xyxy, cls, conf)
+
+        self._add_to_timeline(len(cls))
+        self.frames += 1
+
+    def _add_to_timeline(self, count):
+        bucket = self.frames // self._bucket_width
+        if bucket >= self.max_timeline:
+            half = self.max_timeline // 2
+            self._timeline_sums[:half] = self._timeline_sums.reshape(-1, 2).sum(axis=1)
+            self._timeline_frames[:half] = self._timeline_frames.reshape(-1, 2).sum(axis=1)
+            self._timeline_sums[half:] = 0
+            self._timeline_frames[half:] = 0
+            self._bucket_width *= 2
+            bucket = self.frames // self._bucket_width
+        self._timeline_sums[bucket] += count
+        self._timeline_frames[bucket] += 1
+
+    def _collect_crops(self, frame, xyxy, cls, conf):
+        height, width = frame.shape[:2]
+        for i in np.argsort(-conf)[:self.top_k]:
+            if len(self._crops) == self.top_k and conf[i] <= self._crops[0][0]:
+                break
+            x1, y1, x2, y2 = xyxy[i].astype(int)
+            crop = frame[max(y1, 0):min(y2, height), max(x1, 0):min(x2, width)].copy()
+            if crop.size == 0:
+                continue
+            self._seq += 1
+            item = (float(conf[i]), self._seq, self.label(cls[i]), crop)
+            if len(self._crops) < self.top_k:
+                heapq.heappush(self._crops, item)
+            else:
+                heapq.heapreplace(self._crops, item)
+
+    def label(self, cls_id):
+        return self.class_names.get(int(cls_id), 'Unknown')
+
+    def counts(self):
+        return {self.label(i): int(self.class_counts[i]) for i in np.flatnonzero(self.class_counts)}
+
+    def mean_confidence(self):
+        seen = np.flatnonzero(self.class_counts)
+        return {self.label(i): float(self.conf_sums[i] / self.class_counts[i]) for i in seen}
+
+    def class_summary(self):
+        # (label, count, mean confidence) per detected class, most frequent first
+        seen = np.flatnonzero(self.class_counts)
+        seen = seen[np.argsort(-self.class_counts[seen], kind="stable")]
+        means = self.conf_sums[seen] / self.class_counts[seen]
+        return [(self.label(i), int(self.class_counts[i]), float(m)) for i, m in zip(seen, means)]
+
+    def confidence_histogram(self):
+        edges = np.linspace(0.0, 1.0, self.conf_bins + 1)
+        return edges, self.conf_hist.sum(axis=0)
+
+    def timeline(self):
+        # Returns (first frame index of each bucket, mean objects per frame in that bucket)
+        used = np.flatnonzero(self._timeline_frames)
+        starts = used * self._bucket_width
+        return starts, self._timeline_sums[used] / self._timeline_frames[used]
+
+    def top_crops(self):
+        return [(label, conf, crop) for conf, _, label, crop in sorted(self._crops, reverse=True)]
+
+
+def describe_objects(aggregator):
+    if aggregator.total == 0:
+        return "No objects were detected."
+    description = ", ".join([f"{count} {label}" for label, count, _ in aggregator.class_summary()])
+    return f"This image contains: {description}."
+
+
+def bar_chart_png(labels, values):
+    # Uses a standalone Figure rather than pyplot, so nothing is left registered in the
+    # global figure manager after rendering
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 3))
+    ax = fig.subplots()
+    ax.bar(labels, values, color='skyblue')
+    ax.set_title("Detected Objects Count")
+    ax.set_ylabel("Count")
+    ax.set_xlabel("Object Class")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
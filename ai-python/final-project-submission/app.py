@@ -1,39 +1,45 @@
 import streamlit as st
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from ultralytics import YOLO
 from PIL import Image
 from io import BytesIO
-import tempfile
+import os
+import time
+from contextlib import ExitStack, closing
 import torch
-from ultralytics.engine.results import Boxes
+from aggregation import DetectionAggregator, bar_chart_png, describe_objects
+from detector import BACKENDS, ModelRegistry
+from result_cache import ResultCache
+from spool import UploadSpool, default_spool_dir
+from timing import StageTimer
+from video_export import AnnotatedVideoWriter
+from video_pipeline import VideoPipeline, AllFramesSampler, StrideSampler, SceneChangeSampler
 
 # Set page config
 st.set_page_config(page_title="YOLOv8 Object Detection", layout="wide")
 
-# ---- OOP Implementation ----
-class YOLODetector:
-    def __init__(self, model_name):
-        self.model = YOLO(model_name)
-
-    def detect(self, image, confidence=0.3):
-        results = self.model(image, conf=confidence) 
-        return results[0]
-
-    def draw_boxes(self, image, results):
-        img_copy = image.copy()
-        boxes = results.boxes
-        class_names = self.model.names
-        for box in boxes:
-            x1, y1, x2, y2 = map(int,  box.xyxy[0])
-            cls_id = int(box.cls[0])
-            label = f"{class_names[cls_id]}"
-            conf = float(box.conf[0])
-            cv2.rectangle(img_copy, (x1, y1), (x2, y2), (255, 0, 0), 2)
-            cv2.putText(img_copy, f"{label} {conf:.2f}", (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-        return img_copy, class_names, boxes
+# ---- Model Registry ----
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry()
+
+# ---- Upload Spool ----
+SPOOL_QUOTA_MB = float(os.environ.get("YOLO_SPOOL_QUOTA_MB", 2048))
+
+@st.cache_resource
+def get_upload_spool():
+    return UploadSpool(default_spool_dir(), quota_mb=SPOOL_QUOTA_MB)
+
+# ---- Result Cache ----
+RESULT_CACHE_MB = float(os.environ.get("YOLO_RESULT_CACHE_MB", 256))
+RESULT_CACHE_DIR = os.environ.get("YOLO_RESULT_CACHE_DIR")
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(max_mb=RESULT_CACHE_MB, directory=RESULT_CACHE_DIR)
+
+# Video frames are resized to this width before inference; the annotated export is drawn on those frames
+VIDEO_WIDTH = 600
 
 # ---- Utility Functions ----
 def load_image(uploaded_file):
@@ -61,40 +67,44 @@ def display_gradient_title(text):
 
 display_gradient_title("YOLOv8 Object Detection")
 
-def describe_objects(boxes, class_names):
-    if boxes.shape[0] == 0:
-        return "No objects were detected."
-    classes = boxes.cls.int().tolist()
-    counts = {}
-    for cls in classes:
-        label = class_names.get(cls, 'Unknown')
-        counts[label] = counts.get(label, 0) + 1
-    description = ", ".join([f"{v} {k}" for k, v in counts.items()])
-    return f"This image contains: {description}."
-
-def generate_bar_chart(boxes, class_names):
-    if boxes.shape[0] == 0:
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_bar_chart(labels, values):
+    return bar_chart_png(list(labels), list(values))
+
+def generate_bar_chart(aggregator, timer=None):
+    if aggregator.total == 0:
         return None
-    classes = boxes.cls.int().tolist()
-    counts = {}
-    for cls in classes:
-        label = class_names.get(cls, 'Unknown')
-        counts[label] = counts.get(label, 0) + 1
-    labels = list(counts.keys())
-    values = list(counts.values())
-
-    fig, ax = plt.subplots(figsize=(12, 3))
-    ax.bar(labels, values, color='skyblue')
-    ax.set_title("Detected Objects Count")
-    ax.set_ylabel("Count")
-    ax.set_xlabel("Object Class")
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
+    summary = aggregator.class_summary()
+    labels = tuple(label for label, _, _ in summary)
+    values = tuple(count for _, count, _ in summary)
+
+    start = time.perf_counter()
+    st.image(render_bar_chart(labels, values), use_container_width=True)
+    st.caption("Mean confidence: " + ", ".join(f"{label} {conf:.2f}" for label, _, conf in summary))
+    if timer is not None:
+        timer.record("bar_chart", time.perf_counter() - start)
+
+def show_performance_panel(timer):
+    with st.sidebar:
+        st.subheader("Performance")
+        st.table(timer.summary())
+        st.download_button(
+            label="Export timings (JSON)",
+            data=timer.to_json(),
+            file_name="detection_timings.json",
+            mime="application/json",
+            use_container_width=True,
+        )
 
 # ---- Sidebar Controls ----
 with st.sidebar:
     st.header("Settings")
     model_name = st.selectbox("Choose YOLOv8 model", ["yolov8n.pt", "yolov8s.pt", "yolov8m.pt", "yolov8l.pt", "yolov8x.pt"])
+    devices = ["cpu"] + (["cuda"] if torch.cuda.is_available() else [])
+    device = st.selectbox("Device", devices)
+    backend = st.selectbox("Inference backend", BACKENDS,
+                           help="ONNX backends are exported next to the .pt weights on first use.")
+    half_precision = device == "cuda" and backend == "torch" and st.checkbox("Half precision (FP16)", value=False)
     source_type = st.selectbox("Source Type", ["Image", "Video"])
 
     if source_type == "Image":
@@ -102,126 +112,243 @@ with st.sidebar:
         uploaded_file = st.file_uploader("Upload an Image", type=['png', 'jpg', 'jpeg'])
     else:
         uploaded_file = st.file_uploader("Upload a Video", type=['mp4', 'mov', 'avi'])
+        batch_size = st.slider("Frames per batch", 1, 32, 8)
+        sampling_mode = st.selectbox("Frame sampling", ["All frames", "Fixed stride", "Scene change"])
+        if sampling_mode == "Fixed stride":
+            frame_stride = st.slider("Infer every Nth frame", 2, 30, 5)
+        elif sampling_mode == "Scene change":
+            scene_threshold = st.slider("Scene change threshold", 0.01, 0.30, 0.05, 0.01)
+        top_k_crops = st.slider("Top detections to keep", 0, 12, 6)
+        export_video = st.checkbox("Export annotated video", value=False)
+        if export_video:
+            export_width = st.slider("Export width", 320, VIDEO_WIDTH, VIDEO_WIDTH, step=40,
+                                     help="Frames are annotated at the inference width, so the export can only be downscaled.")
+            export_frame_skip = st.slider("Write every Nth frame", 1, 10, 1)
 
     confidence = st.slider("Model Confidence", 0.0, 1.0, 0.3, 0.05)
     detect_btn = st.button("Run Detection")
+    show_performance = st.checkbox("Show performance panel", value=False)
 
-# ---- Main UI ----
-if detect_btn and uploaded_file:
-    detector = YOLODetector(model_name)
+    cache_stats = get_result_cache().stats()
+    st.caption(f"Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+               f"{cache_stats['entries']} entries ({cache_stats['size_mb']:.1f} MB)")
 
-    if source_type == 'Image':
+# ---- Detection Runs ----
+def load_detector(timer):
+    with st.spinner(f"Loading {model_name}..."), timer.stage("load_model"):
+        return get_model_registry().get(model_name, device=device, half=half_precision, backend=backend)
+
+def process_image(uploaded_file, timer):
+    detector = load_detector(timer)
+    with timer.stage("load_image"):
         image = load_image(uploaded_file)
+    with timer.stage("resize"):
         image = cv2.resize(image, (image_resize, int(image.shape[0] * image_resize / image.shape[1])))
-        
+    
+    with timer.stage("detect"):
         result = detector.detect(image, confidence=confidence)
+    with timer.stage("draw_boxes"):
         annotated_image, class_names, boxes = detector.draw_boxes(image, result)
+    aggregator = DetectionAggregator(class_names)
+    aggregator.update(result)
+
+    # Convert image to PIL for download
+    with timer.stage("png_encode"):
+        pil_img = Image.fromarray(cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB))
+        img_buffer = BytesIO()
+        pil_img.save(img_buffer, format="PNG")
+
+    return {
+        "image": image,
+        "annotated_image": annotated_image,
+        "png_bytes": img_buffer.getvalue(),
+        "aggregator": aggregator,
+        "description": describe_objects(aggregator),
+    }
+
+def process_video(uploaded_file, timer):
+    detector = load_detector(timer)
+    class_names = detector.model.names
+    aggregator = DetectionAggregator(class_names, top_k=top_k_crops)
+    
+    sample_frame_orig = None
+    sample_frame_annotated = None
+
+    if sampling_mode == "Fixed stride":
+        sampler = StrideSampler(frame_stride)
+    elif sampling_mode == "Scene change":
+        sampler = SceneChangeSampler(threshold=scene_threshold)
+    else:
+        sampler = AllFramesSampler()
+
+    st.subheader("Processing Video...")
+    progress_bar = st.progress(0)
+    frame_count = 0
+
+    # The spooled copy is deleted when this block exits, including on reruns and errors
+    spool = get_upload_spool()
+    export_path = None
+    with timer.stage("video_total"), spool.spooled(uploaded_file) as video_path, ExitStack() as stack:
+        cap = cv2.VideoCapture(video_path)
+        stack.callback(cap.release)
+
+        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        output_width = VIDEO_WIDTH
+        output_height = int(frame_height * output_width / frame_width) if frame_width > 0 else 0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        pipeline = VideoPipeline(detector, (output_width, output_height), confidence=confidence,
+                                 batch_size=batch_size, sampler=sampler)
+        writer = None
+        if export_video and output_height > 0:
+            export_path = stack.enter_context(
+                spool.reserved(prefix="annotated", suffix=".mp4", expected_bytes=uploaded_file.size))
+            writer = stack.enter_context(AnnotatedVideoWriter(
+                export_path, cap.get(cv2.CAP_PROP_FPS), (output_width, output_height), detector.draw_boxes,
+                output_width=export_width, frame_skip=export_frame_skip))
+
+        if output_height > 0:
+            with closing(pipeline.run(cap)) as frames:
+                for index, resized_frame, result in frames:
+                    frame_count += 1
+                    aggregator.update(result, frame=resized_frame)
+
+                    if sample_frame_annotated is None and len(result.boxes) > 0:
+                        sample_frame_orig = resized_frame.copy()
+                        with timer.stage("draw_boxes"):
+                            sample_frame_annotated, _, _ = detector.draw_boxes(resized_frame, result)
+
+                    if writer is not None:
+                        writer.write(index, resized_frame, result)
+
+                    if total_frames > 0:
+                        progress_bar.progress(min(frame_count / total_frames, 1.0))
+    progress_bar.empty()
+
+    stage_stats = pipeline.stats() + ([writer.stats()] if writer is not None else [])
+    with st.expander("Pipeline stats"):
+        st.table(stage_stats)
+    timer.extra["pipeline"] = stage_stats
+
+    return {
+        "sample_frame_orig": sample_frame_orig,
+        "sample_frame_annotated": sample_frame_annotated,
+        "aggregator": aggregator,
+        "description": describe_objects(aggregator),
+        "frame_count": frame_count,
+        "inferred_frames": pipeline.inferred_frames,
+        "export_path": export_path,
+    }
+
+# ---- Main UI ----
+if detect_btn and uploaded_file:
+    result_cache = get_result_cache()
+    timer = StageTimer()
+
+    if source_type == 'Image':
+        cache_key = ResultCache.make_key(uploaded_file, source="image", model_name=model_name, backend=backend,
+                                         device=device, half_precision=half_precision,
+                                         confidence=confidence, image_resize=image_resize)
+        with timer.stage("cache_lookup"):
+            run = result_cache.get(cache_key)
+        if run is None:
+            run = process_image(uploaded_file, timer)
+            result_cache.put(cache_key, run)
+        else:
+            st.caption("Loaded from the result cache.")
 
         col = st.columns([1, 4, 4, 1])
         with col[1]:
             st.subheader("Original Image")
-            st.image(image)
+            st.image(run["image"])
         with col[2]:
             st.subheader("Detected Objects")
-            st.image(annotated_image)
-            
-            # Convert image to PIL for download
-            pil_img = Image.fromarray(cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB))
-            img_buffer = BytesIO()
-            pil_img.save(img_buffer, format="PNG")
-            img_bytes = img_buffer.getvalue()
+            st.image(run["annotated_image"])
 
             st.download_button(
                 label="📥 Download Detected Image",
-                data=img_bytes,
+                data=run["png_bytes"],
                 file_name="detected_output.png",
                 mime="image/png",
                 use_container_width=True,
             )
 
         # Description below images
-        description = describe_objects(boxes, class_names)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.markdown(f"<p style='text-align:center;font-size:18px;font-weight:600;'>{description}</p>", unsafe_allow_html=True)
-        generate_bar_chart(boxes, class_names)
+        st.markdown(f"<p style='text-align:center;font-size:18px;font-weight:600;'>{run['description']}</p>", unsafe_allow_html=True)
+        generate_bar_chart(run["aggregator"], timer)
     
     elif source_type == 'Video':
-        tfile = tempfile.NamedTemporaryFile(delete=False)
-        tfile.write(uploaded_file.read())
-        
-        cap = cv2.VideoCapture(tfile.name)
-        
-        all_boxes = []
-        class_names = detector.model.names
-        
-        sample_frame_orig = None
-        sample_frame_annotated = None
-
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        output_width = 600
-        output_height = int(frame_height * output_width / frame_width) if frame_width > 0 else 0
-        
-        st.subheader("Processing Video...")
-        progress_bar = st.progress(0)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        frame_count = 0
-        while cap.isOpened() and output_height > 0:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            resized_frame = cv2.resize(frame, (output_width, output_height))
-            
-            result = detector.detect(resized_frame, confidence=confidence)
-            
-            if len(result.boxes) > 0:
-                all_boxes.append(result.boxes)
-            
-            if sample_frame_annotated is None and len(result.boxes) > 0:
-                sample_frame_orig = resized_frame
-                sample_frame_annotated, _, _ = detector.draw_boxes(resized_frame, result)
-            
-            if total_frames > 0:
-                progress_bar.progress(frame_count / total_frames)
+        sampling_params = {"mode": sampling_mode}
+        if sampling_mode == "Fixed stride":
+            sampling_params["stride"] = frame_stride
+        elif sampling_mode == "Scene change":
+            sampling_params["threshold"] = scene_threshold
+        cache_key = ResultCache.make_key(uploaded_file, source="video", model_name=model_name, backend=backend,
+                                         device=device, half_precision=half_precision,
+                                         confidence=confidence, sampling=sampling_params,
+                                         top_k=top_k_crops,
+                                         export=[export_width, export_frame_skip] if export_video else None)
+        with timer.stage("cache_lookup"):
+            # The export lives in the upload spool, which the quota or a restart may have cleared since
+            run = result_cache.get(cache_key, validate=lambda cached: not cached.get("export_path")
+                                   or os.path.exists(cached["export_path"]))
+        if run is None:
+            run = process_video(uploaded_file, timer)
+            result_cache.put(cache_key, run)
+        else:
+            st.caption("Loaded from the result cache.")
 
-        cap.release()
-        progress_bar.empty()
+        aggregator = run["aggregator"]
+        if run["frame_count"] > 0:
+            st.caption(f"Ran inference on {run['inferred_frames']} of {run['frame_count']} frames "
+                       f"({sampling_mode.lower()}).")
 
-        if not all_boxes:
+        if aggregator.total == 0:
             st.warning("No objects were detected in the video.")
         else:
-            all_xyxy = torch.cat([b.xyxy for b in all_boxes])
-            all_conf = torch.cat([b.conf for b in all_boxes])
-            all_cls = torch.cat([b.cls for b in all_boxes])
-            
-            combined_tensor = torch.cat([
-                all_xyxy, 
-                all_conf.unsqueeze(1), 
-                all_cls.unsqueeze(1)
-            ], dim=1)
-            
-            combined_boxes = Boxes(
-                combined_tensor, 
-                sample_frame_orig.shape[:2]
-            )
-            
             st.subheader("Video Processing Complete")
             
             col = st.columns(2)
             with col[0]:
                 st.subheader("Sample Frame")
-                st.image(sample_frame_orig, channels="BGR", use_container_width=True)
+                st.image(run["sample_frame_orig"], channels="BGR", use_container_width=True)
             with col[1]:
                 st.subheader("Annotated Sample")
-                st.image(sample_frame_annotated, channels="BGR", use_container_width=True)
+                st.image(run["sample_frame_annotated"], channels="BGR", use_container_width=True)
 
-            description = describe_objects(combined_boxes, class_names)
             st.markdown("<hr>", unsafe_allow_html=True)
-            st.markdown(f"<p style='text-align:center;font-size:18px;font-weight:600;'>{description}</p>", unsafe_allow_html=True)
-            generate_bar_chart(combined_boxes, class_names)
+            st.markdown(f"<p style='text-align:center;font-size:18px;font-weight:600;'>{run['description']}</p>", unsafe_allow_html=True)
+            generate_bar_chart(aggregator, timer)
+
+            starts, objects_per_frame = aggregator.timeline()
+            export_path = run.get("export_path")
+            if export_path and os.path.exists(export_path):
+                # download_button reads the whole file into Streamlit's media store; the export is only
+                # kept off the heap while it is being encoded
+                with open(export_path, "rb") as f:
+                    st.download_button(
+                        label="📥 Download Annotated Video",
+                        data=f,
+                        file_name="detected_output.mp4",
+                        mime="video/mp4",
+                        use_container_width=True,
+                    )
+
+            st.subheader("Objects per Frame")
+            st.line_chart({"frame": starts, "objects": objects_per_frame}, x="frame", y="objects")
+
+            top_crops = aggregator.top_crops()
+            if top_crops:
+                st.subheader("Highest-Confidence Detections")
+                crop_cols = st.columns(min(len(top_crops), 6))
+                for i, (label, conf, crop) in enumerate(top_crops):
+                    with crop_cols[i % len(crop_cols)]:
+                        st.image(crop, channels="BGR", caption=f"{label} {conf:.2f}")
+
+    if show_performance:
+        show_performance_panel(timer)
 
 elif uploaded_file and not detect_btn:
     st.info(f"Click the 'Run Detection' button from the sidebar to process the uploaded {source_type.lower()}.")
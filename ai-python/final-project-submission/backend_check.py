@@ -0,0 +1,33 @@
+import argparse
+import json
+import sys
+
+import cv2
+
+from batch_detect import IMAGE_EXTENSIONS, find_inputs
+from detector import BACKENDS, compare_backends
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report detection drift of exported backends against PyTorch.")
+    parser.add_argument("inputs", nargs="+", help="Image files or directories")
+    parser.add_argument("-m", "--model", default="yolov8n.pt")
+    parser.add_argument("-c", "--confidence", type=float, default=0.3)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS[1:], choices=BACKENDS[1:])
+    parser.add_argument("--limit", type=int, default=100, help="Maximum number of images to compare")
+    args = parser.parse_args(argv)
+
+    paths = [path for _, path in find_inputs(args.inputs)
+             if path.lower().endswith(tuple(IMAGE_EXTENSIONS))][:args.limit]
+    images = [image for image in map(cv2.imread, paths) if image is not None]
+    if not images:
+        print("No readable images found.", file=sys.stderr)
+        return 1
+
+    report = compare_backends(args.model, images, backends=args.backends, confidence=args.confidence)
+    print(json.dumps({"model": args.model, "images": len(images), "backends": report}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+
+import cv2
+import torch
+
+from aggregation import DetectionAggregator, describe_objects
+from detector import BACKENDS, YOLODetector, export_backend
+from video_pipeline import VideoPipeline
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi"}
+DETECTION_FIELDS = ["file", "frame", "class_id", "label", "confidence", "x1", "y1", "x2", "y2"]
+
+# One detector per worker process, created by the pool initializer
+_detector = None
+_options = None
+
+
+# ---- Input discovery ----
+def find_inputs(paths):
+    # Returns (rel_path, path) pairs. rel_path is relative to the directory above the input roots
+    # (e.g. "a/cat.jpg" and "b/cat.jpg"), so inputs from different roots stay distinct.
+    roots = [os.path.abspath(os.path.dirname(path) or ".") if os.path.isfile(path) else os.path.abspath(path)
+             for path in paths]
+    if not roots:
+        return []
+    anchor = os.path.commonpath(roots)
+    if len(set(roots)) == 1:
+        anchor = os.path.dirname(anchor)
+    inputs = []
+    seen = set()
+    for path in paths:
+        if os.path.isfile(path):
+            candidates = [path]
+        else:
+            candidates = [os.path.join(root, name) for root, _, files in os.walk(path) for name in sorted(files)
+                          if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS]
+        for candidate in candidates:
+            full_path = os.path.abspath(candidate)
+            if full_path not in seen:
+                seen.add(full_path)
+                inputs.append((os.path.relpath(full_path, anchor), candidate))
+    return inputs
+
+
+def part_name(path):
+    # Keyed on the absolute input path, so same-named files in different folders never share outputs
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]}"
+
+
+# ---- Worker side ----
+def init_worker(options):
+    global _detector, _options
+    # Split the cores between workers instead of letting every worker grab all of them
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // options["workers"]))
+    _options = options
+    _detector = YOLODetector(options["model"], device=options["device"], backend=options["backend"])
+    _detector.warmup()
+
+
+def resized_size(width, height):
+    output_width = _options["resize_width"] or width
+    return output_width, int(height * output_width / width)
+
+
+def detection_rows(rel_path, frame_index, result):
+    boxes = result.boxes
+    if len(boxes) == 0:
+        return []
+    names = _detector.model.names
+    rows = []
+    data = boxes.data.cpu().numpy()
+    for x1, y1, x2, y2, conf, cls_id in data[:, [0, 1, 2, 3, -2, -1]].tolist():
+        rows.append({
+            "file": rel_path, "frame": frame_index, "class_id": int(cls_id),
+            "label": names.get(int(cls_id), "Unknown"), "confidence": round(conf, 4),
+            "x1": round(x1, 1), "y1": round(y1, 1), "x2": round(x2, 1), "y2": round(y2, 1),
+        })
+    return rows
+
+
+def process_image(path, rel_path, annotated_path, detections):
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Could not read image {path}")
+    height, width = image.shape[:2]
+    image = cv2.resize(image, resized_size(width, height))
+    result = _detector.detect(image, confidence=_options["confidence"])
+
+    aggregator = DetectionAggregator(_detector.model.names)
+    aggregator.update(result)
+    if annotated_path:
+        _detector.draw_boxes(image, result, out=image)
+        cv2.imwrite(annotated_path, image)
+    detections.write(detection_rows(rel_path, 0, result))
+    return aggregator, 1
+
+
+def process_video(path, rel_path, annotated_path, detections):
+    cap = cv2.VideoCapture(path)
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Could not read video {path}")
+        output_size = resized_size(width, height)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        writer = None
+        if annotated_path:
+            writer = cv2.VideoWriter(annotated_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, output_size)
+
+        aggregator = DetectionAggregator(_detector.model.names)
+        pipeline = VideoPipeline(_detector, output_size, confidence=_options["confidence"],
+                                 batch_size=_options["batch_size"])
+        frames = 0
+        try:
+            with closing(pipeline.run(cap)) as results:
+                for index, frame, result in results:
+                    detections.write(detection_rows(rel_path, index, result))
+                    aggregator.update(result)
+                    if writer is not None:
+                        _detector.draw_boxes(frame, result, out=frame)
+                        writer.write(frame)
+                    frames += 1
+        finally:
+            if writer is not None:
+                writer.release()
+    finally:
+        cap.release()
+    return aggregator, frames
+
+
+def process_file(path, rel_path, part_path):
+    start = time.perf_counter()
+    kind = "video" if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS else "image"
+
+    annotated_path = None
+    if _options["annotate"]:
+        # Same folder layout as the inputs, file named like the detections part (stem + path hash)
+        # so cat.jpg and cat.png, or a/cat.jpg and b/cat.jpg, never overwrite each other
+        annotated_path = os.path.join(_options["output_dir"], "annotated", os.path.dirname(rel_path),
+                                      os.path.splitext(os.path.basename(part_path))[0])
+        annotated_path += ".png" if kind == "image" else ".mp4"
+        os.makedirs(os.path.dirname(annotated_path), exist_ok=True)
+
+    # The part file is written atomically; its presence marks the input as done for --resume
+    with DetectionWriter(part_path, _options["format"]) as detections:
+        if kind == "video":
+            aggregator, frames = process_video(path, rel_path, annotated_path, detections)
+        else:
+            aggregator, frames = process_image(path, rel_path, annotated_path, detections)
+    return {
+        "file": rel_path,
+        "kind": kind,
+        "frames": frames,
+        "detections": detections.count,
+        "counts": aggregator.counts(),
+        "description": describe_objects(aggregator),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+# ---- Output ----
+# Streams detection rows into "<part>.tmp" as frames are processed, so a long video never
+# holds its rows in memory, and renames it over the part file only once the input is done.
+# Parquet rows are buffered into row groups of PARQUET_BATCH_ROWS.
+PARQUET_BATCH_ROWS = 10_000
+
+
+class DetectionWriter:
+    def __init__(self, part_path, fmt):
+        self.part_path = part_path
+        self.tmp_path = part_path + ".tmp"
+        self.fmt = fmt
+        self.count = 0
+        self._file = None
+        self._writer = None
+        self._pending = []
+
+    def __enter__(self):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._schema = pa.schema([
+                ("file", pa.string()), ("frame", pa.int64()), ("class_id", pa.int64()), ("label", pa.string()),
+                ("confidence", pa.float64()), ("x1", pa.float64()), ("y1", pa.float64()),
+                ("x2", pa.float64()), ("y2", pa.float64()),
+            ])
+            self._writer = pq.ParquetWriter(self.tmp_path, self._schema)
+        else:
+            self._file = open(self.tmp_path, "w", newline="" if self.fmt == "csv" else None)
+            if self.fmt == "csv":
+                self._writer = csv.DictWriter(self._file, fieldnames=DETECTION_FIELDS)
+                self._writer.writeheader()
+        return self
+
+    def write(self, rows):
+        self.count += len(rows)
+        if self.fmt == "jsonl":
+            self._file.writelines(json.dumps(row) + "\n" for row in rows)
+        elif self.fmt == "csv":
+            self._writer.writerows(rows)
+        else:
+            self._pending.extend(rows)
+            if len(self._pending) >= PARQUET_BATCH_ROWS:
+                self._flush_parquet()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.fmt == "parquet":
+                if exc_type is None:
+                    self._flush_parquet()
+                self._writer.close()
+            else:
+                self._file.close()
+        except BaseException:
+            self._discard()
+            raise
+        if exc_type is None:
+            os.replace(self.tmp_path, self.part_path)
+        else:
+            self._discard()
+
+    def _discard(self):
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _flush_parquet(self):
+        if not self._pending:
+            return
+        import pyarrow as pa
+        columns = {field: [row[field] for row in self._pending] for field in DETECTION_FIELDS}
+        self._writer.write_table(pa.table(columns, schema=self._schema))
+        self._pending = []
+
+
+# ---- Main ----
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run YOLOv8 detection over image and video folders.")
+    parser.add_argument("inputs", nargs="+", help="Image/video files or directories to scan recursively")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument("-m", "--model", default="yolov8n.pt")
+    parser.add_argument("-c", "--confidence", type=float, default=0.3)
+    parser.add_argument("--resize-width", type=int, default=600, help="0 keeps the original size")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per forward pass for videos")
+    parser.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv", "parquet"], default="jsonl")
+    parser.add_argument("--annotate", action="store_true", help="Also write annotated images/videos")
+    parser.add_argument("--resume", action="store_true", help="Skip inputs finished by a previous run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    detections_dir = os.path.join(args.output_dir, "detections")
+    os.makedirs(detections_dir, exist_ok=True)
+    summary_path = os.path.join(args.output_dir, "summary.jsonl")
+
+    jobs = []
+    skipped = 0
+    for rel_path, path in find_inputs(args.inputs):
+        part_path = os.path.join(detections_dir, f"{part_name(path)}.{args.format}")
+        if args.resume and os.path.exists(part_path):
+            skipped += 1
+            continue
+        jobs.append((path, rel_path, part_path))
+    if not args.resume and os.path.exists(summary_path):
+        os.remove(summary_path)
+
+    # Export once up front so workers don't race to write the same ONNX files
+    export_backend(args.model, args.backend)
+
+    print(f"{len(jobs)} files to process, {skipped} already done, {args.workers} workers", file=sys.stderr)
+    options = {
+        "model": args.model, "device": args.device, "backend": args.backend, "confidence": args.confidence,
+        "resize_width": args.resize_width, "batch_size": args.batch_size, "workers": args.workers,
+        "format": args.format, "annotate": args.annotate, "output_dir": args.output_dir,
+    }
+
+    start = time.perf_counter()
+    totals = {"files": 0, "images": 0, "frames": 0, "detections": 0, "failed": 0}
+    # spawn: forked copies of an initialised torch runtime are not safe to use
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=init_worker,
+                             initargs=(options,)) as pool, open(summary_path, "a") as summary_file:
+        futures = {pool.submit(process_file, *job): job for job in jobs}
+        for future in as_completed(futures):
+            path = futures[future][0]
+            try:
+                summary = future.result()
+            except Exception as e:
+                totals["failed"] += 1
+                print(f"FAILED {path}: {e}", file=sys.stderr)
+                continue
+            summary_file.write(json.dumps(summary) + "\n")
+            summary_file.flush()
+            totals["files"] += 1
+            totals["detections"] += summary["detections"]
+            if summary["kind"] == "image":
+                totals["images"] += 1
+            else:
+                totals["frames"] += summary["frames"]
+            print(f"[{totals['files']}/{len(jobs)}] {summary['file']}: {summary['description']} "
+                  f"({summary['seconds']:.2f}s)", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {totals['files']} files ({totals['failed']} failed) in {elapsed:.1f}s", file=sys.stderr)
+    if elapsed > 0:
+        print(f"  {totals['files'] / elapsed:.2f} files/s, {totals['images'] / elapsed:.2f} images/s, "
+              f"{totals['frames'] / elapsed:.2f} video frames/s, {totals['detections']} detections",
+              file=sys.stderr)
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from io import BytesIO
+
+import cv2
+import numpy as np
+import psutil
+from PIL import Image
+
+from aggregation import DetectionAggregator, bar_chart_png
+from detector import BACKENDS, YOLODetector
+from timing import StageTimer
+from video_pipeline import VideoPipeline
+
+
+# ---- Synthetic inputs ----
+def synthetic_image(width, height, seed=0):
+    # Noise background with a few solid shapes, so the model has edges to work on
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for _ in range(8):
+        x, y = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+        w, h = int(rng.integers(20, width // 3)), int(rng.integers(20, height // 3))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(image, (x, y), (x + w, y + h), color, -1)
+    return image
+
+
+def synthetic_video(path, width, height, frames, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    base = synthetic_image(width, height)
+    for i in range(frames):
+        # Slide the scene so consecutive frames differ a little, like real footage
+        writer.write(np.roll(base, shift=4 * i, axis=1))
+    writer.release()
+
+
+# ---- Peak RSS ----
+class PeakRSS:
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = self._process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            time.sleep(self.interval)
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
+
+
+# ---- Benchmarks ----
+def bench_image(detector, width, iterations, confidence):
+    timer = StageTimer()
+    source = synthetic_image(width * 2, int(width * 1.5))
+    with PeakRSS() as rss:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            with timer.stage("resize"):
+                image = cv2.resize(source, (width, int(source.shape[0] * width / source.shape[1])))
+            with timer.stage("detect"):
+                result = detector.detect(image, confidence=confidence)
+            with timer.stage("draw_boxes"):
+                annotated, class_names, _ = detector.draw_boxes(image, result)
+            with timer.stage("png_encode"):
+                buffer = BytesIO()
+                Image.fromarray(annotated).save(buffer, format="PNG")
+            with timer.stage("bar_chart"):
+                aggregator = DetectionAggregator(class_names)
+                aggregator.update(result)
+                summary = aggregator.class_summary()
+                bar_chart_png([label for label, _, _ in summary], [count for _, count, _ in summary])
+            timer.record("end_to_end", time.perf_counter() - start)
+    end_to_end = next(row for row in timer.summary() if row["stage"] == "end_to_end")
+    return {
+        "p50_ms": end_to_end["p50_ms"],
+        "p95_ms": end_to_end["p95_ms"],
+        "fps": round(1000 / end_to_end["mean_ms"], 2) if end_to_end["mean_ms"] else 0.0,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "stages": timer.summary(),
+    }
+
+
+def bench_video(detector, video_path, width, batch_size, confidence):
+    cap = cv2.VideoCapture(video_path)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) * width / cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    pipeline = VideoPipeline(detector, (width, height), confidence=confidence, batch_size=batch_size)
+    latencies = []
+    frames = 0
+    with PeakRSS() as rss:
+        start = last = time.perf_counter()
+        with closing(pipeline.run(cap)) as results:
+            for _ in results:
+                now = time.perf_counter()
+                latencies.append(now - last)
+                last = now
+                frames += 1
+        elapsed = time.perf_counter() - start
+    cap.release()
+    ms = np.array(latencies or [0.0]) * 1000
+    return {
+        "frames": frames,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "stages": pipeline.stats(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # A config regresses if its FPS drops by more than `tolerance` relative to the baseline
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get(r["name"])
+        if old and old["fps"] and r["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(f"{r['name']}: {old['fps']} -> {r['fps']} fps")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline on synthetic inputs.")
+    parser.add_argument("--models", nargs="+", default=["yolov8n.pt"])
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--widths", nargs="+", type=int, default=[320, 640])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--iterations", type=int, default=20, help="Images per image benchmark")
+    parser.add_argument("--video-frames", type=int, default=120)
+    parser.add_argument("--confidence", type=float, default=0.3)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="JSON from a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed FPS drop vs. baseline")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "synthetic.mp4")
+        synthetic_video(video_path, 1280, 720, args.video_frames)
+
+        for model in args.models:
+            detector = YOLODetector(model, device=args.device, backend=args.backend)
+            detector.warmup()
+            for width in args.widths:
+                r = bench_image(detector, width, args.iterations, args.confidence)
+                results.append({"name": f"image/{model}/{width}", **r})
+                for batch_size in args.batch_sizes:
+                    r = bench_video(detector, video_path, width, batch_size, args.confidence)
+                    results.append({"name": f"video/{model}/{width}/b{batch_size}", **r})
+
+    print(f"{'benchmark':<40} {'p50 ms':>9} {'p95 ms':>9} {'fps':>8} {'peak MB':>9}")
+    for r in results:
+        print(f"{r['name']:<40} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['fps']:>8} {r['peak_rss_mb']:>9}")
+
+    report = {"backend": args.backend, "device": args.device, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
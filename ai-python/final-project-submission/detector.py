@@ -0,0 +1,216 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+_export_lock = threading.Lock()
+
+
+# ---- Backends ----
+def export_backend(model_name, backend):
+    # Returns the weights file for a backend, exporting it next to the .pt weights on first use
+    if backend == "torch":
+        return model_name
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+    with _export_lock:
+        torch_model = YOLO(model_name)
+        stem = os.path.splitext(torch_model.ckpt_path or model_name)[0]
+        onnx_path = stem + ".onnx"
+        if not os.path.exists(onnx_path):
+            # Dynamic axes so the exported graph accepts batched frames and any input size
+            onnx_path = torch_model.export(format="onnx", dynamic=True, simplify=False)
+        if backend == "onnx":
+            return onnx_path
+
+        int8_path = stem + ".int8.onnx"
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+
+
+class YOLODetector:
+    def __init__(self, model_name, device="cpu", half=False, backend="torch"):
+        self.weights = export_backend(model_name, backend)
+        self.model = YOLO(self.weights, task="detect")
+        self.backend = backend
+        self.device = device
+        # Exported ONNX graphs run in FP32 on ONNX Runtime
+        self.half = half and backend == "torch"
+        self._label_cache = None
+        # A YOLO instance is shared between sessions, and its predictor is not thread-safe
+        self._lock = threading.Lock()
+
+    def detect(self, image, confidence=0.3):
+        with self._lock:
+            results = self.model(image, conf=confidence, device=self.device, half=self.half)
+        return results[0]
+
+    def detect_batch(self, frames, confidence=0.3, batch_size=8):
+        # Accepts a list of frames or a stacked (N, H, W, 3) array, returns one result per frame
+        frames = list(frames)
+        results = []
+        for start in range(0, len(frames), batch_size):
+            with self._lock:
+                results.extend(self.model(frames[start:start + batch_size], conf=confidence,
+                                          device=self.device, half=self.half, verbose=False))
+        return results
+
+    def warmup(self, size=640):
+        dummy = np.zeros((size, size, 3), dtype=np.uint8)
+        with self._lock:
+            self.model(dummy, device=self.device, half=self.half, verbose=False)
+
+    def memory_mb(self):
+        if self.backend != "torch":
+            return os.path.getsize(self.weights) / (1024 ** 2)
+        params = self.model.model.parameters()
+        return sum(p.numel() * p.element_size() for p in params) / (1024 ** 2)
+
+    def draw_boxes(self, image, results, out=None):
+        # Pass out=image to draw in place, or a preallocated buffer of the same shape to reuse it
+        if out is None:
+            canvas = image.copy()
+        else:
+            if out is not image:
+                np.copyto(out, image)
+            canvas = out
+        boxes = results.boxes
+        class_names = self.model.names
+        if len(boxes) == 0:
+            return canvas, class_names, boxes
+
+        # One device-to-host transfer for every box instead of per-box tensor indexing
+        data = boxes.data.cpu().numpy()
+        corners = data[:, :4].astype(np.int32)
+        confs = data[:, -2].tolist()
+        cls_ids = data[:, -1].astype(np.int32).tolist()
+        labels = self._labels()
+
+        x1, y1, x2, y2 = corners.T
+        polygons = np.stack([x1, y1, x2, y1, x2, y2, x1, y2], axis=1).reshape(-1, 4, 2)
+        cv2.polylines(canvas, list(polygons), True, (255, 0, 0), 2)
+        for (left, top), cls_id, conf in zip(corners[:, :2].tolist(), cls_ids, confs):
+            cv2.putText(canvas, f"{labels[cls_id]} {conf:.2f}", (left, top - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        return canvas, class_names, boxes
+
+    def _labels(self):
+        if self._label_cache is None:
+            self._label_cache = {cls_id: f"{name}" for cls_id, name in self.model.names.items()}
+        return self._label_cache
+
+
+# ---- Model Registry ----
+MAX_RESIDENT_MODELS = int(os.environ.get("YOLO_MAX_RESIDENT_MODELS", 2))
+MAX_RESIDENT_MEMORY_MB = float(os.environ.get("YOLO_MAX_RESIDENT_MEMORY_MB", 1024))
+
+
+class ModelRegistry:
+    def __init__(self, max_models=MAX_RESIDENT_MODELS, max_memory_mb=MAX_RESIDENT_MEMORY_MB):
+        self.max_models = max_models
+        self.max_memory_mb = max_memory_mb
+        self._models = OrderedDict()  # (model_name, device, half, backend) -> (detector, size_mb)
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name, device="cpu", half=False, backend="torch"):
+        key = (model_name, device, half, backend)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Only one session loads a given model; the others wait here and reuse it
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+            detector = YOLODetector(model_name, device=device, half=half, backend=backend)
+            detector.warmup()
+
+            with self._lock:
+                self._models[key] = (detector, detector.memory_mb())
+                self._loading.pop(key, None)
+                self._evict()
+        return detector
+
+    def _evict(self):
+        # The most recently used model is always kept, even if it alone exceeds the budget
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models or self.memory_mb() > self.max_memory_mb
+        ):
+            (_, device, _, _), _ = self._models.popitem(last=False)
+            if device.startswith("cuda"):
+                torch.cuda.empty_cache()
+
+    def memory_mb(self):
+        return sum(size_mb for _, size_mb in self._models.values())
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+
+# ---- Backend drift check ----
+def box_iou(a, b):
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def compare_results(reference, candidate, iou_threshold=0.5):
+    # Greedily matches candidate boxes to same-class reference boxes by IoU
+    ref = reference.boxes.data.cpu().numpy()
+    cand = candidate.boxes.data.cpu().numpy()
+    matched_ious, conf_diffs = [], []
+    if len(ref) and len(cand):
+        ious = box_iou(ref[:, :4], cand[:, :4])
+        ious[ref[:, -1][:, None] != cand[:, -1][None, :]] = 0.0
+        for i in np.argsort(-ref[:, -2]):
+            j = int(np.argmax(ious[i]))
+            if ious[i, j] >= iou_threshold:
+                matched_ious.append(ious[i, j])
+                conf_diffs.append(abs(ref[i, -2] - cand[j, -2]))
+                ious[:, j] = 0.0
+    return {
+        "reference_boxes": len(ref),
+        "candidate_boxes": len(cand),
+        "matched": len(matched_ious),
+        "mean_iou": float(np.mean(matched_ious)) if matched_ious else 0.0,
+        "mean_conf_diff": float(np.mean(conf_diffs)) if conf_diffs else 0.0,
+    }
+
+
+def compare_backends(model_name, images, backends=("onnx", "onnx-int8"), confidence=0.3, device="cpu"):
+    reference = YOLODetector(model_name, device=device)
+    reference_results = [reference.detect(image, confidence=confidence) for image in images]
+    report = {}
+    for backend in backends:
+        detector = YOLODetector(model_name, device=device, backend=backend)
+        stats = [compare_results(ref, detector.detect(image, confidence=confidence))
+                 for ref, image in zip(reference_results, images)]
+        reference_boxes = sum(s["reference_boxes"] for s in stats)
+        candidate_boxes = sum(s["candidate_boxes"] for s in stats)
+        matched = sum(s["matched"] for s in stats)
+        report[backend] = {
+            "recall": matched / reference_boxes if reference_boxes else 1.0,
+            "precision": matched / candidate_boxes if candidate_boxes else 1.0,
+            "mean_iou": float(np.mean([s["mean_iou"] for s in stats if s["matched"]] or [0.0])),
+            "mean_conf_diff": float(np.mean([s["mean_conf_diff"] for s in stats if s["matched"]] or [0.0])),
+        }
+    return report
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+
+CHUNK_SIZE = 1024 * 1024
+
+
+# LRU cache of finished detection runs, keyed by a hash of the uploaded bytes and the
+# detection parameters. Entries are pickled once on insert, which also gives their size
+# for the byte cap; with a directory set they are mirrored to disk and survive restarts.
+class ResultCache:
+    def __init__(self, max_mb=256, directory=None):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> pickled value
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(uploaded_file, **params):
+        digest = hashlib.sha256()
+        position = uploaded_file.tell()
+        uploaded_file.seek(0)
+        for chunk in iter(lambda: uploaded_file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        uploaded_file.seek(position)
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key, validate=None):
+        # validate(value) -> False drops an entry that can no longer be served (e.g. its
+        # files are gone); that counts as a miss, not a hit
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+        if payload is None and self.directory:
+            payload = self._read_disk(key)
+            if payload is not None:
+                with self._lock:
+                    self._store(key, payload)
+        value = None if payload is None else pickle.loads(payload)
+        if value is not None and validate is not None and not validate(value):
+            self.discard(key)
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            payload = self._entries.pop(key, None)
+            if payload is not None:
+                self._bytes -= len(payload)
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def put(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, payload)
+        if self.directory:
+            self._write_disk(key, payload)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "size_mb": self._bytes / (1024 * 1024),
+            }
+
+    def _store(self, key, payload):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = payload
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    # ---- Disk mirror ----
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark as recently used for disk eviction
+        return payload
+
+    def _write_disk(self, key, payload):
+        tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(key))
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        usage = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if usage <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            usage -= size
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+CHUNK_SIZE = 1024 * 1024
+
+
+# Spools uploaded files to disk so OpenCV can open them by path.
+# Small uploads go to a RAM-backed directory (/dev/shm) when available. Disk spool
+# files are removed as soon as a run finishes or aborts, and the spool directory is
+# kept under a size quota by evicting the oldest leftovers (e.g. from a killed process).
+class UploadSpool:
+    def __init__(self, directory, quota_mb=2048, memory_dir="/dev/shm", memory_threshold_mb=32):
+        self.directory = directory
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.memory_dir = memory_dir if memory_dir and os.path.isdir(memory_dir) else None
+        self.memory_threshold_bytes = int(memory_threshold_mb * 1024 * 1024)
+        self._active = set()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @contextmanager
+    def spooled(self, uploaded_file, suffix=None):
+        if suffix is None:
+            suffix = os.path.splitext(getattr(uploaded_file, "name", ""))[1]
+        size = _file_size(uploaded_file)
+        if self.memory_dir and size <= self.memory_threshold_bytes:
+            directory = self.memory_dir
+        else:
+            directory = self.directory
+            self._make_room(size)
+
+        path = os.path.join(directory, f"upload-{uuid.uuid4().hex}{suffix}")
+        with self._lock:
+            self._active.add(path)
+        try:
+            uploaded_file.seek(0)
+            with open(path, "wb") as f:
+                # Copy in chunks instead of materialising a second full copy with read()
+                shutil.copyfileobj(uploaded_file, f, CHUNK_SIZE)
+            yield path
+        finally:
+            with self._lock:
+                self._active.discard(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def reserved(self, prefix="output", suffix="", expected_bytes=0):
+        # A file that outlives the block (e.g. a download); the quota evicts it later.
+        # Partially written files are removed if the block fails or is interrupted.
+        self._make_room(expected_bytes)
+        path = os.path.join(self.directory, f"{prefix}-{uuid.uuid4().hex}{suffix}")
+        with self._lock:
+            self._active.add(path)
+        try:
+            yield path
+        except BaseException:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            raise
+        finally:
+            with self._lock:
+                self._active.discard(path)
+
+    def usage_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.is_file():
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _make_room(self, needed):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            usage = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if usage + needed <= self.quota_bytes:
+                    break
+                if path in self._active:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                usage -= size
+
+
+def _file_size(f):
+    size = getattr(f, "size", None)
+    if size is None:
+        position = f.tell()
+        size = f.seek(0, os.SEEK_END)
+        f.seek(position)
+    return size
+
+
+def default_spool_dir():
+    return os.environ.get("YOLO_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "yolo-upload-spool"))
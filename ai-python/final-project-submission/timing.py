@@ -0,0 +1,41 @@
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# Collects wall-clock samples per named stage of a detection run
+class StageTimer:
+    def __init__(self):
+        self._samples = OrderedDict()
+        self.extra = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self._samples.setdefault(name, []).append(seconds)
+
+    def summary(self):
+        rows = []
+        for name, samples in self._samples.items():
+            ms = np.array(samples) * 1000
+            rows.append({
+                "stage": name,
+                "calls": len(ms),
+                "total_ms": round(float(ms.sum()), 2),
+                "mean_ms": round(float(ms.mean()), 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            })
+        return rows
+
+    def to_json(self):
+        return json.dumps({"stages": self.summary(), **self.extra}, indent=2)
@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Tried in order; avc1 (H.264) plays in browsers but is not in every OpenCV build
+FOURCCS = ["avc1", "mp4v"]
+
+
+def open_video_writer(path, fps, frame_size):
+    for code in FOURCCS:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*code), fps, frame_size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+    raise RuntimeError(f"No usable MP4 encoder found (tried {', '.join(FOURCCS)})")
+
+
+# Annotates and encodes frames on a background thread as they are produced.
+# The queue is bounded, so a slow encoder applies backpressure instead of buffering the video.
+class AnnotatedVideoWriter:
+    def __init__(self, path, fps, frame_size, draw, output_width=None, frame_skip=1, queue_size=16):
+        width, height = frame_size
+        # Frames arrive at the inference size; upscaling them would only cost encode time and disk
+        output_width = min(output_width or width, width)
+        # Most encoders want even dimensions
+        self.output_size = (output_width - output_width % 2,
+                            int(height * output_width / width) // 2 * 2)
+        self.path = path
+        self.frame_skip = max(1, int(frame_skip))
+        self.frames_written = 0
+        self.busy_s = 0.0
+        self.max_queue_depth = 0
+        self._draw = draw
+        self._writer = open_video_writer(path, (fps or 30.0) / self.frame_skip, self.output_size)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, index, frame, result):
+        if self._error is not None:
+            raise self._error
+        if index % self.frame_skip:
+            return
+        # The frame is annotated in place, so the caller must not reuse it afterwards
+        self._queue.put((frame, result))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._writer.release()
+        if self._error is not None:
+            raise self._error
+
+    def stats(self):
+        return {
+            "stage": "encode",
+            "items": self.frames_written,
+            "busy_s": round(self.busy_s, 3),
+            "avg_ms": round(1000 * self.busy_s / self.frames_written, 2) if self.frames_written else 0.0,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue  # keep draining so write() never blocks on a dead encoder
+            frame, result = item
+            start = time.perf_counter()
+            try:
+                self._draw(frame, result, out=frame)
+                if (frame.shape[1], frame.shape[0]) != self.output_size:
+                    frame = cv2.resize(frame, self.output_size, interpolation=cv2.INTER_AREA)
+                self._writer.write(frame)
+            except Exception as e:
+                self._error = e
+                continue
+            self.busy_s += time.perf_counter() - start
+            self.frames_written += 1
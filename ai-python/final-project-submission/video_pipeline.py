@@ -0,0 +1,225 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Marks the end of the stream on every queue
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_s = 0.0
+        self.max_queue_depth = 0
+        self.queue = None
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_s": round(self.busy_s, 3),
+            "avg_ms": round(1000 * self.busy_s / self.items, 2) if self.items else 0.0,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+# ---- Frame Samplers ----
+# A sampler decides, in frame order, whether a frame goes through inference or
+# reuses the detections of the last inferred frame.
+class AllFramesSampler:
+    def should_infer(self, index, frame):
+        return True
+
+
+class StrideSampler:
+    def __init__(self, stride):
+        self.stride = max(1, int(stride))
+
+    def should_infer(self, index, frame):
+        return index % self.stride == 0
+
+
+class SceneChangeSampler:
+    def __init__(self, threshold=0.05, max_gap=30, size=(64, 36)):
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.size = size
+        self._keyframe = None
+        self._keyframe_index = 0
+
+    def should_infer(self, index, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self._keyframe is not None and index - self._keyframe_index < self.max_gap:
+            # Compare against the last inferred frame so slow drift still triggers
+            if cv2.absdiff(small, self._keyframe).mean() / 255.0 < self.threshold:
+                return False
+        self._keyframe = small
+        self._keyframe_index = index
+        return True
+
+
+# Runs decode -> resize -> infer on worker threads, linked by bounded queues.
+# run() yields (index, frame, result) on the calling thread, which acts as the
+# aggregation stage, so Streamlit calls stay on the script thread.
+class VideoPipeline:
+    def __init__(self, detector, output_size, confidence=0.3, batch_size=8, queue_size=32, sampler=None):
+        self.detector = detector
+        self.sampler = sampler or AllFramesSampler()
+        self.output_size = output_size
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.cancel_event = threading.Event()
+        self._stats = {name: StageStats(name) for name in ("decode", "resize", "infer", "aggregate")}
+        self._error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def inferred_frames(self):
+        return self._stats["infer"].items
+
+    def stats(self):
+        return [stage.as_dict() for stage in self._stats.values()]
+
+    # ---- Queue helpers ----
+    def _put(self, q, item, stage):
+        while not self.cancel_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            stage.max_queue_depth = max(stage.max_queue_depth, q.qsize())
+            return True
+        return False
+
+    def _get(self, q):
+        while not self.cancel_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _worker(self, target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            self._error = e
+            self.cancel()
+
+    # ---- Stages ----
+    def _decode(self, cap, out_q):
+        stage = self._stats["decode"]
+        index = 0
+        try:
+            while not self.cancel_event.is_set():
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                stage.busy_s += time.perf_counter() - start
+                if not ret:
+                    break
+                stage.items += 1
+                if not self._put(out_q, (index, frame), stage):
+                    break
+                index += 1
+        finally:
+            self._put(out_q, _DONE, stage)
+
+    def _resize(self, in_q, out_q):
+        stage = self._stats["resize"]
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    break
+                index, frame = item
+                start = time.perf_counter()
+                resized = cv2.resize(frame, self.output_size)
+                infer = self.sampler.should_infer(index, resized)
+                stage.busy_s += time.perf_counter() - start
+                stage.items += 1
+                if not self._put(out_q, (index, resized, infer), stage):
+                    break
+        finally:
+            self._put(out_q, _DONE, stage)
+
+    def _infer(self, in_q, out_q):
+        stage = self._stats["infer"]
+        done = False
+        last_result = None
+        try:
+            while not done:
+                item = self._get(in_q)
+                if item is _DONE:
+                    break
+                # Take whatever is already queued instead of waiting for a full batch,
+                # so the model never sits idle while the decoder catches up
+                batch = [item]
+                while len(batch) < self.batch_size:
+                    try:
+                        item = in_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    batch.append(item)
+
+                frames = [frame for _, frame, infer in batch if infer]
+                results = iter(())
+                if frames:
+                    start = time.perf_counter()
+                    results = iter(self.detector.detect_batch(frames, confidence=self.confidence,
+                                                              batch_size=self.batch_size))
+                    stage.busy_s += time.perf_counter() - start
+                    stage.items += len(frames)
+                # Skipped frames carry the detections of the last inferred frame
+                for index, frame, infer in batch:
+                    if infer:
+                        last_result = next(results)
+                    if not self._put(out_q, (index, frame, last_result), stage):
+                        return
+        finally:
+            self._put(out_q, _DONE, stage)
+
+    def run(self, cap):
+        decoded_q = queue.Queue(maxsize=self.queue_size)
+        resized_q = queue.Queue(maxsize=self.queue_size)
+        results_q = queue.Queue(maxsize=self.queue_size)
+        self._stats["decode"].queue = decoded_q
+        self._stats["resize"].queue = resized_q
+        self._stats["infer"].queue = results_q
+
+        threads = [
+            threading.Thread(target=self._worker, args=(self._decode, cap, decoded_q), daemon=True),
+            threading.Thread(target=self._worker, args=(self._resize, decoded_q, resized_q), daemon=True),
+            threading.Thread(target=self._worker, args=(self._infer, resized_q, results_q), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        aggregate = self._stats["aggregate"]
+        try:
+            while True:
+                item = self._get(results_q)
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                yield item
+                aggregate.busy_s += time.perf_counter() - start
+                aggregate.items += 1
+        finally:
+            # Also reached when the caller stops iterating, e.g. on a Streamlit rerun
+            self.cancel()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
@@ -1,5 +1,9 @@
+import os
+
 import streamlit as st
 
+from quiz_engine import load_quizzes, quiz_files
+
 # Set page config
 st.set_page_config(page_title="Find Your Dream Travel Destination", page_icon="🌍", layout="centered")
 st.audio("https://raw.githubusercontent.com/AlviGeo/ai-projects/master/fun-project_1_REAID/assets/audio/background-music.mp3")
@@ -33,105 +37,44 @@ with st.sidebar:
     st.markdown("- [LinkedIn](https://www.linkedin.com/in/alvigeovanny)")
     st.markdown("- [Instagram](https://instagram.com/alvigeovanny)")
 
-st.title("💼 Find Your Dream Travel Destination")
-st.write("Answer the questions below and we'll match you with a destination you'll love!")
+# Load quizzes: parsed and compiled once per process, reloaded only when a quiz file changes
+QUIZ_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quizzes")
 
-# Load assets
-destinations = {
-    "Beach Lover": {
-        "score": 0,
-        "image": "https://images.unsplash.com/photo-1507525428034-b723cf961d3e",
-        "description": "You love the sound of waves, sunshine, and relaxing on sandy beaches. Consider visiting Bali, Maldives, or Santorini."
-    },
-    "Nature Explorer": {
-        "score": 0,
-        "image": "https://images.unsplash.com/photo-1506744038136-46273834b3fb",
-        "description": "You find peace in mountains, forests, and waterfalls. Try places like New Zealand, Patagonia, or Banff."
-    },
-    "City Wanderer": {
-        "score": 0,
-        "image": "https://plus.unsplash.com/premium_photo-1681628908570-3c95bed77a8e?q=80&w=3764&auto=format&fit=crop&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
-        "description": "You love the energy of city life, street food, and museums. Explore Tokyo, New York, or Paris."
-    }
-}
+@st.cache_resource(max_entries=1)
+def get_quizzes(signature):
+    return load_quizzes(QUIZ_DIR)
 
-# List Questions
-questions = [
-    {
-        "question": "What kind of scenery do you prefer?",
-        "options": {
-            "Beaches and oceans": "Beach Lover",
-            "Mountains and forests": "Nature Explorer",
-            "Skyscrapers and city lights": "City Wanderer"
-        }
-    },
-    {
-        "question": "What type of vacation do you enjoy?",
-        "options": {
-            "Relaxing and sunbathing": "Beach Lover",
-            "Hiking and exploring nature": "Nature Explorer",
-            "Shopping and trying new restaurants": "City Wanderer"
-        }
-    },
-    {
-        "question": "Your ideal weekend looks like...",
-        "options": {
-            "Lying on a beach with a good book": "Beach Lover",
-            "Camping or going on a trail": "Nature Explorer",
-            "Attending concerts or local events": "City Wanderer"
-        }
-    },
-    {
-        "question": "What type of weather makes you happiest?",
-        "options": {
-            "Sunny and breezy": "Beach Lover",
-            "Cool and crisp": "Nature Explorer",
-            "Mild and ever-changing": "City Wanderer"
-        }
-    },
-    {
-        "question": "Which activity appeals to you most?",
-        "options": {
-            "Snorkeling or surfing": "Beach Lover",
-            "Climbing or wildlife watching": "Nature Explorer",
-            "Museum hopping or city walking tours": "City Wanderer"
-        }
-    },
-    {
-        "question": "What type of photos do you take most?",
-        "options": {
-            "Sunsets, waves, and beaches": "Beach Lover",
-            "Trees, mountains, and trails": "Nature Explorer",
-            "Architecture and cityscapes": "City Wanderer"
-        }
-    }
-]
+quizzes = get_quizzes(tuple((path, os.path.getmtime(path)) for path in quiz_files(QUIZ_DIR)))
+quiz_ids = list(quizzes.keys())
+if len(quiz_ids) > 1:
+    quiz = quizzes[st.selectbox("Choose a quiz", quiz_ids, format_func=lambda quiz_id: quizzes[quiz_id].title)]
+else:
+    quiz = quizzes[quiz_ids[0]]
 
-# Initialize scores in session state
-if "scores" not in st.session_state:
-    st.session_state.scores = {k: 0 for k in destinations.keys()}
+st.title(quiz.title)
+st.write(quiz.intro)
 
-# Form for quiz
-with st.form("quiz_form"):
-    for i, q in enumerate(questions):
-        choice = st.radio(q["question"], list(q["options"].keys()), key=f"q{i}")
-        selected_category = q["options"][choice]
-        st.session_state.scores[selected_category] += 1
+# Form for quiz: answers are option indices, scored in one pass on submit
+with st.form(f"quiz_form_{quiz.id}"):
+    answers = []
+    for i, (question, options) in enumerate(zip(quiz.questions, quiz.options)):
+        answers.append(st.radio(question, range(len(options)), format_func=options.__getitem__, key=f"{quiz.id}_q{i}"))
     submitted = st.form_submit_button("Find My Destination")
 
 # Show result section
 if submitted:
-    scores = st.session_state.scores
-    top_score = max(scores.values())
-    top_destinations = [k for k, v in scores.items() if v == top_score]
+    best, scores, tied = quiz.result(answers)
 
-    if len(top_destinations) > 1:
+    if best is None:
         st.warning("😕 It's a tie! Try answering more consistently so we can better match your travel style.")
     else:
-        best = top_destinations[0]
+        if tied:
+            st.caption(f"It was a close call between {', '.join(tied)}.")
         st.subheader(f"🌏 Your Dream Destination Style: {best}")
-        st.image(destinations[best]["image"])
-        st.write(destinations[best]["description"])
+        category = quiz.categories[best]
+        if category.get("image"):
+            st.image(category["image"])
+        st.write(category.get("description", ""))
 
         # Share result
         st.markdown("**Want to share your result?**")
@@ -140,6 +83,3 @@ if submitted:
 
         st.success("Result generated successfully!")
         st.balloons()
-
-    # Reset scores after submission 
-    st.session_state.scores = {k: 0 for k in scores.keys()}
@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+
+QUIZ_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class QuizError(ValueError):
+    pass
+
+
+# A quiz compiled into a dense weight tensor: weights[q, o, c] is how much picking option o
+# of question q counts towards category c. Questions with fewer options are zero-padded, so
+# scoring any set of answers is one gather + sum regardless of quiz size.
+class Quiz:
+    def __init__(self, quiz_id, title, intro, categories, questions, tie_break="order"):
+        self.id = quiz_id
+        self.title = title
+        self.intro = intro
+        self.category_names = list(categories.keys())
+        self.categories = categories
+        self.questions = [q["question"] for q in questions]
+        self.options = [[text for text, _ in q["options"]] for q in questions]
+        self.option_counts = np.array([len(options) for options in self.options])
+        self.weights = self._compile(questions)
+        self.tie_break = tie_break
+        self._rank = self._tie_break_rank(tie_break)
+
+    def _compile(self, questions):
+        index = {name: c for c, name in enumerate(self.category_names)}
+        max_options = max(len(q["options"]) for q in questions)
+        weights = np.zeros((len(questions), max_options, len(index)), dtype=np.float32)
+        for q, question in enumerate(questions):
+            for o, (_, option_weights) in enumerate(question["options"]):
+                for category, weight in option_weights.items():
+                    if category not in index:
+                        raise QuizError(f"{self.id}: question {q + 1} refers to unknown category {category!r}")
+                    weights[q, o, index[category]] = weight
+        return weights
+
+    def _tie_break_rank(self, tie_break):
+        # Lower rank wins a tie; "none" leaves ties unresolved for the caller to report
+        if tie_break == "none":
+            return None
+        order = self.category_names if tie_break == "order" else list(tie_break)
+        unknown = set(order) - set(self.category_names)
+        if unknown or len(order) != len(self.category_names):
+            raise QuizError(f"{self.id}: tie_break must be 'order', 'none' or a list of all categories")
+        return np.array([order.index(name) for name in self.category_names])
+
+    def score(self, answers):
+        # answers: option index per question, shape (Q,) for one respondent or (N, Q) for many.
+        # Returns category totals with shape (C,) or (N, C).
+        answers = np.asarray(answers, dtype=np.intp)
+        if answers.shape[-1] != len(self.questions):
+            raise QuizError(f"{self.id}: expected {len(self.questions)} answers, got {answers.shape[-1]}")
+        if (answers < 0).any() or (answers >= self.option_counts).any():
+            raise QuizError(f"{self.id}: answer index out of range")
+        return self.weights[np.arange(len(self.questions)), answers].sum(axis=-2)
+
+    def result(self, answers):
+        # Returns (winner or None, {category: score}, [tied categories])
+        scores = self.score(answers)
+        tied = np.flatnonzero(scores == scores.max())
+        by_name = dict(zip(self.category_names, scores.tolist()))
+        if len(tied) == 1:
+            return self.category_names[tied[0]], by_name, []
+        tied_names = [self.category_names[c] for c in tied]
+        if self._rank is None:
+            return None, by_name, tied_names
+        return self.category_names[tied[np.argmin(self._rank[tied])]], by_name, tied_names
+
+
+def _parse_options(quiz_id, q, options):
+    # Options map text -> category (weight 1) or text -> {category: weight, ...}
+    if not isinstance(options, dict) or not options:
+        raise QuizError(f"{quiz_id}: question {q + 1} needs a non-empty 'options' mapping")
+    parsed = []
+    for text, value in options.items():
+        weights = {value: 1.0} if isinstance(value, str) else {k: float(v) for k, v in value.items()}
+        parsed.append((text, weights))
+    return parsed
+
+
+def parse_quiz(data, quiz_id):
+    try:
+        categories = data["categories"]
+        questions = [{"question": q["question"], "options": _parse_options(quiz_id, i, q["options"])}
+                     for i, q in enumerate(data["questions"])]
+    except (KeyError, TypeError) as e:
+        raise QuizError(f"{quiz_id}: missing or malformed field {e}") from e
+    if not categories or not questions:
+        raise QuizError(f"{quiz_id}: a quiz needs at least one category and one question")
+    return Quiz(data.get("id", quiz_id), data.get("title", quiz_id), data.get("intro", ""),
+                categories, questions, data.get("tie_break", "order"))
+
+
+def load_quiz(path):
+    quiz_id, ext = os.path.splitext(os.path.basename(path))
+    with open(path, encoding="utf-8") as f:
+        if ext == ".json":
+            data = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError as e:
+                raise QuizError(f"{path}: install PyYAML to load YAML quizzes") from e
+            data = yaml.safe_load(f)
+    return parse_quiz(data, quiz_id)
+
+
+def quiz_files(directory):
+    return sorted(entry.path for entry in os.scandir(directory)
+                  if entry.is_file() and entry.name.endswith(QUIZ_EXTENSIONS))
+
+
+def load_quizzes(directory):
+    quizzes = {}
+    for path in quiz_files(directory):
+        quiz = load_quiz(path)
+        if quiz.id in quizzes:
+            raise QuizError(f"Duplicate quiz id {quiz.id!r} in {directory}")
+        quizzes[quiz.id] = quiz
+    return quizzes
@@ -1,86 +1,169 @@
 import streamlit as st
-import sqlite3
 from datetime import datetime
-import requests
-import re
+import logging
+import os
+import time
+from openrouter_client import OpenRouterClient, OpenRouterError
+from context_builder import build_context, summary_request
+from response_cache import ResponseCache
+from model_compare import compare_models
+from storage import (register_user, login_user, create_room, room_exists, get_rooms, delete_room,
+                     store_chat, get_chat_page, clear_chat_history, search_chats)
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 st.set_page_config(page_title="Find Your Dream Travel Destination", page_icon="🤖", layout="centered")
 
-DB_PATH = "chat_history.db"
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-c = conn.cursor()
-c.execute('''CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL
-)''')
-c.execute('''CREATE TABLE IF NOT EXISTS chat_rooms (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT NOT NULL,
-    room_name TEXT NOT NULL
-)''')
-c.execute('''CREATE TABLE IF NOT EXISTS chats (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT,
-    room_id INTEGER,
-    model TEXT,
-    message TEXT,
-    response TEXT,
-    timestamp TEXT
-)''')
-conn.commit()
-
-def register_user(username, password):
-    if not username or not password:
-        return False, "Username and password cannot be empty."
-    if not re.match(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).+$', password):
-        return False, "Password must have at least 1 uppercase, 1 lowercase, 1 number, and not empty."
+@st.cache_resource
+def get_openrouter_client():
+    return OpenRouterClient(
+        connect_timeout=float(os.environ.get("OPENROUTER_CONNECT_TIMEOUT", 5)),
+        read_timeout=float(os.environ.get("OPENROUTER_READ_TIMEOUT", 60)),
+        max_retries=int(os.environ.get("OPENROUTER_MAX_RETRIES", 3)),
+    )
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(
+        ttl_s=float(os.environ.get("RESPONSE_CACHE_TTL", 24 * 3600)),
+        max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 5000)),
+        max_temperature=float(os.environ.get("RESPONSE_CACHE_MAX_TEMPERATURE", 0.8)),
+    )
+
+MAX_TOKENS = 500
+SUMMARY_MAX_TOKENS = 300
+
+def summarizer(api_key, model):
+    # Folds old turns into the room summary with the same model; on failure the cached
+    # summary is left as is and the turns are simply not sent
+    def summarize(summary, turns):
+        try:
+            data = get_openrouter_client().chat(api_key, model, summary_request(summary, turns),
+                                                temperature=0.2, max_tokens=SUMMARY_MAX_TOKENS)
+            return data["choices"][0]["message"]["content"]
+        except (OpenRouterError, KeyError, IndexError):
+            return None
+    return summarize
+
+def format_timestamp(ts):
     try:
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
-        return True, "Registered successfully."
-    except sqlite3.IntegrityError:
-        return False, "Username already taken."
-    
-def login_user(username, password):
-    if not username or not password:
-        return False, "Username and password cannot be empty."
-    c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-    if c.fetchone():
-        return True, "Login successful."
-    else:
-        return False, "Invalid credentials."
+        return datetime.fromisoformat(ts).strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return ts[:19]
+
+def bubble_text(text):
+    # Line breaks become <br> so a message never adds lines of its own to the bubble HTML
+    return "<br>".join(str(text).splitlines())
+
+def user_bubble(user_msg, formatted_ts):
+    return f"""
+        <div style='display:flex;justify-content:flex-end;margin-bottom:6px;'>
+        <div style='background-color:#DCF8C6;border-radius:15px;padding:10px 15px;max-width:70%;box-shadow:0 1px 3px rgba(0,0,0,0.1);'>
+            <div style='font-size:0.75em;color:#666;text-align:right;'>👩🏻‍💻 {formatted_ts}</div>
+            <div style='font-size:1em;'>{bubble_text(user_msg)}</div>
+            </div>
+        </div>
+        """
+
+def ai_bubble(ai_msg, model_name, formatted_ts):
+    return f"""
+        <div style='display:flex;justify-content:flex-start;margin-bottom:16px;'>
+        <div style='background-color:#F1F0F0;border-radius:15px;padding:10px 15px;max-width:70%;box-shadow:0 1px 3px rgba(0,0,0,0.1);'>
+            <div style='font-size:0.75em;color:#666;'>🧠 {model_name} &nbsp;•&nbsp; {formatted_ts}</div>
+            <div style='font-size:1em;'>{bubble_text(ai_msg)}</div>
+            </div>
+        </div>
+        """
+
+MODEL_OPTIONS = {
+    "Mistral 7B": "mistralai/mistral-7b-instruct",
+    "Llama 2 70B": "meta-llama/llama-3.3-70b-instruct",
+    "GPT-3.5 Turbo": "openai/gpt-3.5-turbo",
+    "Mixtral 8x7B": "mistralai/mixtral-8x7b-instruct"
+}
+REVERSE_MODEL_OPTIONS = {v: k for k, v in MODEL_OPTIONS.items()}
 
-def create_room(username, room_name):
-    c.execute("INSERT INTO chat_rooms (username, room_name) VALUES (?, ?)", (username, room_name))
-    conn.commit()
-    return c.lastrowid
+HISTORY_PAGE_SIZE = 30
 
-def room_exists(username, room_name):
-    c.execute("SELECT 1 FROM chat_rooms WHERE username = ? AND room_name = ?", (username, room_name.strip()))
-    return c.fetchone() is not None
+def load_history(username, room_id):
+    # The loaded window lives in session state; a rerun only fetches rows newer than it
+    history = st.session_state.get("history")
+    if history is None or history["room_id"] != room_id:
+        rows = get_chat_page(username, room_id, limit=HISTORY_PAGE_SIZE + 1)
+        history = {"room_id": room_id, "rows": rows[-HISTORY_PAGE_SIZE:], "has_more": len(rows) > HISTORY_PAGE_SIZE,
+                   "window": HISTORY_PAGE_SIZE}
+        st.session_state.history = history
+        st.session_state.bubbles = {}
+    else:
+        newest_id = history["rows"][-1][0] if history["rows"] else 0
+        history["rows"].extend(get_chat_page(username, room_id, after_id=newest_id))
+        # Keep only the latest `window` messages; older ones are a "load older" away
+        overflow = len(history["rows"]) - history["window"]
+        if overflow > 0:
+            for chat_id, *_ in history["rows"][:overflow]:
+                st.session_state.bubbles.pop(chat_id, None)
+            del history["rows"][:overflow]
+            history["has_more"] = True
+    return history
+
+def load_older_history(username):
+    history = st.session_state.history
+    if not history["rows"]:
+        return
+    rows = get_chat_page(username, history["room_id"], before_id=history["rows"][0][0], limit=HISTORY_PAGE_SIZE + 1)
+    history["has_more"] = len(rows) > HISTORY_PAGE_SIZE
+    history["rows"][:0] = rows[-HISTORY_PAGE_SIZE:]
+    history["window"] += HISTORY_PAGE_SIZE
 
-def get_rooms(username):
-    c.execute("SELECT id, room_name FROM chat_rooms WHERE username=?", (username,))
-    return c.fetchall()
+def render_bubbles(rows, model_labels):
+    # Bubble HTML is built once per message id and reused on every rerun
+    bubbles = st.session_state.setdefault("bubbles", {})
+    parts = []
+    for chat_id, row_model, user_msg, ai_msg, ts in rows:
+        if chat_id not in bubbles:
+            formatted_ts = format_timestamp(ts)
+            html = user_bubble(user_msg, formatted_ts) + ai_bubble(ai_msg, model_labels.get(row_model, row_model), formatted_ts)
+            # Flatten the template to one line: indented or blank lines would break the combined markdown
+            # block. Message text has no newlines left at this point, so only template whitespace goes
+            bubbles[chat_id] = "".join(line.strip() for line in html.splitlines())
+        parts.append(bubbles[chat_id])
+    return "".join(parts)
 
-def delete_room(room_id):
-    c.execute("DELETE FROM chat_rooms WHERE id=?", (room_id,))
-    c.execute("DELETE FROM chats WHERE room_id=?", (room_id,))
-    conn.commit()
+def send_comparison(prompt, models, model_labels, temperature):
+    # Fans the prompt out to every selected model; each bubble fills in as its answer arrives
+    username, room_id = st.session_state.username, st.session_state.room_id
+    formatted_ts = format_timestamp(datetime.now().isoformat())
+    st.markdown(user_bubble(prompt, formatted_ts), unsafe_allow_html=True)
+    placeholders = {}
+    for m in models:
+        placeholders[m] = st.empty()
+        placeholders[m].markdown(ai_bubble("⏳", model_labels.get(m, m), formatted_ts), unsafe_allow_html=True)
 
-def store_chat(username, room_id, model, message, response):
-    c.execute("INSERT INTO chats (username, room_id, model, message, response, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-              (username, room_id, model, message, response, datetime.now().isoformat()))
-    conn.commit()
+    # History is packed per model budget; summaries are only refreshed by single-model sends
+    requests_by_model = {m: build_context(username, room_id, prompt, m)[0] for m in models}
 
-def get_chat_history(username, room_id):
-    c.execute("SELECT model, message, response, timestamp FROM chats WHERE username=? AND room_id=? ORDER BY id ASC", (username, room_id))
-    return c.fetchall()
+    def show(result):
+        text = result["content"] or result["error"]
+        if result["content"] and result["error"]:
+            text = f"{result['content']}\n\n{result['error']}"
+        placeholders[result["model"]].markdown(ai_bubble(text, model_labels.get(result["model"], result["model"]), formatted_ts), unsafe_allow_html=True)
+        store_chat(username, room_id, result["model"], prompt, text, latency_ms=result["latency_s"] * 1000,
+                   prompt_tokens=result["prompt_tokens"], completion_tokens=result["completion_tokens"],
+                   http_status=result["status"], retries=result["retries"])
 
-def clear_chat_history(username, room_id):
-    c.execute("DELETE FROM chats WHERE username=? AND room_id=?", (username, room_id))
-    conn.commit()
+    results, elapsed = compare_models(get_openrouter_client(), st.session_state.api_key, requests_by_model,
+                                      on_result=show, temperature=temperature, max_tokens=MAX_TOKENS)
+    st.session_state.last_comparison = {
+        "elapsed_s": elapsed,
+        "rows": [{
+            "Model": model_labels.get(r["model"], r["model"]),
+            "Latency (s)": round(r["latency_s"], 2),
+            "Prompt tokens": r["prompt_tokens"],
+            "Completion tokens": r["completion_tokens"],
+            "Retries": r["retries"],
+            "Status": "error" if r["error"] else r["status"],
+        } for r in sorted(results, key=lambda r: r["latency_s"])],
+    }
 
 def init_session():
     # Login and auth state
@@ -97,6 +180,9 @@ def init_session():
         "current_model": "mistralai/mistral-7b-instruct",
         "room_id": None,
         "room_name": "",
+        "temperature": 0.7,
+        "use_cache": False,
+        "compare_mode": False,
     }
 
     for key, value in defaults.items():
@@ -127,53 +213,233 @@ def auth_form():
             else:
                 st.error(msg)
 
-def sidebar():
-    st.sidebar.title("💬 Chat Rooms")
-    rooms = get_rooms(st.session_state.username)
+# Each fragment reruns on its own when one of its widgets changes; st.rerun() (full app)
+# is only used when another part of the page has to follow, e.g. switching rooms.
+@st.fragment
+def search_sidebar():
+    query = st.text_input("🔎 Search all chats", key="search_query")
+    if not query.strip():
+        return
+    results = search_chats(st.session_state.username, query)
+    if not results:
+        st.caption("No matches.")
+        return
+    for chat_id, room_id, room_name, row_model, message, response, ts in results:
+        with st.container(border=True):
+            st.caption(f"{room_name} • {format_timestamp(ts)}")
+            st.markdown(f"👩🏻‍💻 {message}\n\n🧠 {response}")
+            if st.button("Open room", key=f"search_hit_{chat_id}"):
+                st.session_state.room_id = room_id
+                st.session_state.room_name = room_name
+                st.rerun()
+
+@st.fragment
+def rooms_sidebar():
+    # The room list is kept in session state and only re-queried after it changes
+    if st.session_state.get("rooms") is None:
+        st.session_state.rooms = get_rooms(st.session_state.username)
+    rooms = st.session_state.rooms
     room_names = [r[1] for r in rooms]
     room_ids = [r[0] for r in rooms]
     if rooms:
-        selected = st.sidebar.radio("Select Room", room_names, index=room_names.index(st.session_state.room_name) if st.session_state.room_name in room_names else 0)
-        st.session_state.room_name = selected
-        st.session_state.room_id = room_ids[room_names.index(selected)]
-        if st.sidebar.button("Delete Room", key="delete_room"):
+        selected = st.radio("Select Room", room_names, index=room_names.index(st.session_state.room_name) if st.session_state.room_name in room_names else 0)
+        room_id = room_ids[room_names.index(selected)]
+        if st.session_state.room_id != room_id:
+            first_run = st.session_state.room_id is None
+            st.session_state.room_name = selected
+            st.session_state.room_id = room_id
+            if not first_run:
+                st.rerun()
+        if st.button("Delete Room", key="delete_room"):
             delete_room(st.session_state.room_id)
+            st.session_state.rooms = None
             st.session_state.room_id = None
             st.session_state.room_name = ""
             st.rerun()
     else:
-        st.sidebar.info("No chat rooms. Create one!")
+        st.info("No chat rooms. Create one!")
         st.session_state.room_id = None
         st.session_state.room_name = ""
-    new_room = st.sidebar.text_input("New Room Name", key="new_room")
-    
-    if st.sidebar.button("Create Room"):
+    new_room = st.text_input("New Room Name", key="new_room")
+
+    if st.button("Create Room"):
         if not new_room.strip():
-            st.sidebar.error("Room name cannot be empty.")
+            st.error("Room name cannot be empty.")
         elif room_exists(st.session_state.username, new_room):
-            st.sidebar.error("Room name already exists under your account. Choose another.")
+            st.error("Room name already exists under your account. Choose another.")
         else:
             room_id = create_room(st.session_state.username, new_room.strip())
+            st.session_state.rooms = None
             st.session_state.room_id = room_id
             st.session_state.room_name = new_room.strip()
             st.rerun()
-    st.sidebar.markdown("---")
-    if st.sidebar.button("Logout"):
-        st.session_state.logged_in = False
-        st.session_state.username = ""
-        st.session_state.api_key = ""
-        st.session_state.room_id = None
-        st.session_state.room_name = ""
-        st.rerun()
+
+def sidebar():
+    with st.sidebar:
+        st.title("💬 Chat Rooms")
+        rooms_sidebar()
+        st.markdown("---")
+        search_sidebar()
+        st.markdown("---")
+        with st.expander("Connection stats"):
+            st.json(get_openrouter_client().stats())
+        with st.expander("Response cache"):
+            st.json(get_response_cache().stats())
+        if st.button("Logout"):
+            st.session_state.logged_in = False
+            st.session_state.username = ""
+            st.session_state.api_key = ""
+            st.session_state.room_id = None
+            st.session_state.room_name = ""
+            st.session_state.rooms = None
+            st.session_state.history = None
+            st.rerun()
+
+@st.fragment
+def model_picker():
+    # Choices only go to session state; the chat panel reads them when a message is sent
+    model_names = list(MODEL_OPTIONS.keys())
+    current_model_name = REVERSE_MODEL_OPTIONS.get(st.session_state.current_model, "Mistral 7B")
+    model_name = st.selectbox("Choose a model", model_names, index=model_names.index(current_model_name))
+    st.session_state.current_model = MODEL_OPTIONS[model_name]
+
+    col1, col2 = st.columns(2)
+    col1.slider("Temperature", 0.0, 1.5, step=0.1, key="temperature")
+    col2.toggle("⚡ Reuse answers to repeated questions", key="use_cache",
+                help=f"Only applies at temperature {get_response_cache().max_temperature} or lower.")
+    if st.toggle("🆚 Compare models side by side", key="compare_mode"):
+        st.multiselect("Models to compare", model_names, default=model_names, key="compare_names")
+
+@st.fragment
+def chat_panel():
+    # Sending a message reruns only this fragment: the history window fetches just the new
+    # row and every other bubble comes from the HTML cache
+    history = load_history(st.session_state.username, st.session_state.room_id)
+    chat_history = history["rows"]
+    model = st.session_state.current_model
+    model_name = REVERSE_MODEL_OPTIONS.get(model, model)
+    cache = get_response_cache()
+
+    # Chat bubbles
+    if history["has_more"]:
+        if st.button("⬆️ Load older messages", use_container_width=True):
+            load_older_history(st.session_state.username)
+            st.rerun(scope="fragment")
+    st.markdown(f"<div style='height:100%;overflow-y:auto;'>{render_bubbles(chat_history, REVERSE_MODEL_OPTIONS)}</div>", unsafe_allow_html=True)
+
+    prompt = st.chat_input("Type your message...")
+    if chat_history and any(msg[2].strip() for msg in chat_history):
+        clear_clicked = st.button("Clear Room Chat", use_container_width=True, type="primary")
+        if clear_clicked:
+            clear_chat_history(st.session_state.username, st.session_state.room_id)
+            st.session_state.history = None
+            st.rerun(scope="fragment")
+
+    comparison = st.session_state.get("last_comparison")
+    if comparison:
+        sequential = sum(row["Latency (s)"] for row in comparison["rows"])
+        st.caption(f"Compared {len(comparison['rows'])} models in {comparison['elapsed_s']:.2f}s "
+                   f"(one after another: ~{sequential:.2f}s)")
+        st.dataframe(comparison["rows"], use_container_width=True, hide_index=True)
+    if st.session_state.get("last_cache_hit") is not None:
+        st.caption(f"⚡ Answered from cache, saved ~{st.session_state.last_cache_hit / 1000:.1f}s")
+    if st.session_state.get("last_ttft") is not None:
+        st.caption(f"Time to first token: {st.session_state.last_ttft:.2f}s")
+    context = st.session_state.get("last_context")
+    if context:
+        reported = f", {context['reported_prompt_tokens']} reported" if context.get("reported_prompt_tokens") else ""
+        st.caption(f"Prompt: ~{context['prompt_tokens']} tokens{reported} of a {context['budget']} budget • "
+                   f"{context['turns']} recent turns" + (" + summary of older ones" if context["summary_tokens"] else ""))
+
+    # Handle sending the message
+    if prompt and prompt.strip():
+        temperature = st.session_state.temperature
+        st.session_state.last_comparison = None
+        if st.session_state.compare_mode:
+            compare_names = st.session_state.get("compare_names") or []
+            if not compare_names:
+                st.warning("Pick at least one model to compare.")
+                return
+            st.session_state.last_cache_hit = None
+            st.session_state.last_ttft = None
+            st.session_state.last_context = None
+            send_comparison(prompt.strip(), [MODEL_OPTIONS[n] for n in compare_names], REVERSE_MODEL_OPTIONS, temperature)
+            st.rerun(scope="fragment")
+
+        use_cache = st.session_state.use_cache
+        cached = cache.get(model, prompt.strip(), temperature, MAX_TOKENS) if use_cache else None
+        st.session_state.last_cache_hit = cached[1] if cached else None
+        if cached:
+            store_chat(st.session_state.username, st.session_state.room_id, model, prompt.strip(), cached[0])
+            st.session_state.last_ttft = None
+            st.session_state.last_context = None
+            st.rerun(scope="fragment")
+
+        formatted_ts = format_timestamp(datetime.now().isoformat())
+        st.markdown(user_bubble(prompt.strip(), formatted_ts), unsafe_allow_html=True)
+        placeholder = st.empty()
+        placeholder.markdown(ai_bubble("▌", model_name, formatted_ts), unsafe_allow_html=True)
+
+        chunks = []
+        error = None
+        completed = False
+        ttft = None
+        stream = None
+        status = None
+        st.session_state.last_context = None
+        start = request_start = last_render = time.perf_counter()
+        try:
+            messages, context = build_context(st.session_state.username, st.session_state.room_id, prompt.strip(),
+                                              model, summarize=summarizer(st.session_state.api_key, model))
+            st.session_state.last_context = context
+            # usage.include asks OpenRouter to end the stream with real token counts
+            request_start = time.perf_counter()
+            stream = get_openrouter_client().stream_chat(st.session_state.api_key, model, messages,
+                                                         temperature=temperature, max_tokens=MAX_TOKENS,
+                                                         usage={"include": True})
+            status = stream.status_code
+            for delta in stream:
+                now = time.perf_counter()
+                if ttft is None:
+                    ttft = now - request_start
+                chunks.append(delta)
+                # Redraw at most ~20 times a second instead of once per token
+                if now - last_render > 0.05:
+                    placeholder.markdown(ai_bubble("".join(chunks) + "▌", model_name, formatted_ts), unsafe_allow_html=True)
+                    last_render = now
+            completed = True
+            if use_cache:
+                cache.put(model, prompt.strip(), temperature, MAX_TOKENS, "".join(chunks),
+                          (time.perf_counter() - start) * 1000)
+        except OpenRouterError as e:
+            error = str(e)
+            status = e.status_code
+        except Exception as e:
+            error = f"[Exception] {str(e)}"
+        finally:
+            # Runs on errors and on Streamlit stopping the script mid-stream, so the
+            # exchange is stored exactly once with whatever text arrived
+            ai_response = "".join(chunks)
+            if error:
+                ai_response = f"{ai_response}\n\n{error}" if ai_response else error
+            elif not completed:
+                ai_response = f"{ai_response} [Cancelled]"
+            usage = (stream.usage if stream is not None else None) or {}
+            store_chat(st.session_state.username, st.session_state.room_id, model, prompt.strip(), ai_response,
+                       latency_ms=(time.perf_counter() - request_start) * 1000,
+                       ttft_ms=ttft * 1000 if ttft is not None else None,
+                       prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"),
+                       http_status=status, retries=stream.retries if stream is not None else None)
+            st.session_state.last_ttft = ttft
+            if usage and st.session_state.get("last_context"):
+                st.session_state.last_context["reported_prompt_tokens"] = usage.get("prompt_tokens")
+        st.rerun(scope="fragment")
 
 def chatbot_ui():
     st.title(f"🤖 AI Chatbot - {st.session_state.room_name}")
     st.caption(f"Logged in as: {st.session_state.username}")
-    
-    # Fetch chat history for this room
-    chat_history = get_chat_history(st.session_state.username, st.session_state.room_id)
 
-    # Ask for API Key if not already stored and no chat history
+    # Ask for API Key if not already stored
     if not st.session_state.get("api_key"):
         api_key = st.text_input("🔑 Enter OpenRouter API Key", type="password")
         if api_key:
@@ -186,97 +452,8 @@ def chatbot_ui():
             st.warning("Enter your API key to start chatting.")
             st.stop()
 
-    # Ask for model selection
-    model_options = {
-        "Mistral 7B": "mistralai/mistral-7b-instruct",
-        "Llama 2 70B": "meta-llama/llama-3.3-70b-instruct",
-        "GPT-3.5 Turbo": "openai/gpt-3.5-turbo",
-        "Mixtral 8x7B": "mistralai/mixtral-8x7b-instruct"
-    }
-    # 2. Set default model in session state if not already set
-    if "current_model" not in st.session_state:
-        st.session_state.current_model = model_options["Mistral 7B"]
-
-    # 3. Reverse lookup to get current model name
-    reverse_model_options = {v: k for k, v in model_options.items()}
-    current_model_name = reverse_model_options.get(st.session_state.current_model, "Mistral 7B")
-
-    # 4. Show dropdown and store result temporarily
-    model_name = st.selectbox("Choose a model", list(model_options.keys()), index=list(model_options.keys()).index(current_model_name))
-
-    # 5. If changed, update session state and force rerun
-    selected_model = model_options[model_name]
-    if st.session_state.current_model != selected_model:
-        st.session_state.current_model = selected_model
-        st.rerun()
-    model = st.session_state.current_model
-
-    # Chat bubbles
-    st.markdown("<div style='height:100%;overflow-y:auto;'>", unsafe_allow_html=True)
-    for i, (model, user_msg, ai_msg, ts) in enumerate(chat_history):
-        try:
-            formatted_ts = datetime.fromisoformat(ts).strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            formatted_ts = ts[:19]
-        
-        # User bubble
-        st.markdown(f"""
-        <div style='display:flex;justify-content:flex-end;margin-bottom:6px;'>
-        <div style='background-color:#DCF8C6;border-radius:15px;padding:10px 15px;max-width:70%;box-shadow:0 1px 3px rgba(0,0,0,0.1);'>
-            <div style='font-size:0.75em;color:#666;text-align:right;'>👩🏻‍💻 {formatted_ts}</div>
-            <div style='font-size:1em;'>{user_msg}</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # AI bubble
-        st.markdown(f"""
-        <div style='display:flex;justify-content:flex-start;margin-bottom:16px;'>
-        <div style='background-color:#F1F0F0;border-radius:15px;padding:10px 15px;max-width:70%;box-shadow:0 1px 3px rgba(0,0,0,0.1);'>
-            <div style='font-size:0.75em;color:#666;'>🧠 {model_name} &nbsp;•&nbsp; {formatted_ts}</div>
-            <div style='font-size:1em;'>{ai_msg}</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-    prompt = st.chat_input("Type your message...")
-    if chat_history and any(msg[1].strip() for msg in chat_history):
-        clear_clicked = st.button("Clear Room Chat", use_container_width=True, type="primary")
-        if clear_clicked:
-            clear_chat_history(st.session_state.username, st.session_state.room_id)
-            st.rerun()
-
-    # Handle sending the message
-    if prompt and prompt.strip():
-        messages = [{"role": "user", "content": prompt.strip()}]
-        headers = {
-            "Authorization": f"Bearer {st.session_state.api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": model,
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 500
-        }
-        with st.spinner("Generating response..."):
-            try:
-                response = requests.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                if response.status_code == 200:
-                    response_data = response.json()
-                    ai_response = response_data["choices"][0]["message"]["content"]
-                else:
-                    ai_response = f"[Error {response.status_code}] {response.text}"
-            except Exception as e:
-                ai_response = f"[Exception] {str(e)}"
-        store_chat(st.session_state.username, st.session_state.room_id, model, prompt.strip(), ai_response)
-        st.rerun()
+    model_picker()
+    chat_panel()
 
 init_session()
 if st.session_state.get("logged_in"):
@@ -0,0 +1,119 @@
+from storage import count_turns_between, get_recent_turns, get_room_summary, get_turns_between, save_room_summary
+
+# Tokens of history (summary + past turns + prompt) we are willing to send per model.
+# Kept well under each context window so the reply (max_tokens) always fits.
+CONTEXT_BUDGETS = {
+    "mistralai/mistral-7b-instruct": 3000,
+    "meta-llama/llama-3.3-70b-instruct": 6000,
+    "openai/gpt-3.5-turbo": 3000,
+    "mistralai/mixtral-8x7b-instruct": 6000,
+}
+DEFAULT_BUDGET = 2000
+MESSAGE_OVERHEAD = 4   # role and separator tokens added per chat message
+MAX_CONTEXT_TURNS = 100
+SUMMARY_TURN_CHARS = 1000
+SUMMARY_BATCH_TURNS = 20   # turns per summarize() call when catching up on a long backlog
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a travel-planning conversation. Merge the new exchanges into the "
+    "existing summary. Keep facts the user shared (preferences, budget, dates, places already discussed) "
+    "and decisions made; drop small talk. Reply with the updated summary only, at most 200 words."
+)
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text; close enough for budgeting without a tokenizer
+    return (len(text) + 3) // 4 if text else 0
+
+
+def context_budget(model):
+    return CONTEXT_BUDGETS.get(model, DEFAULT_BUDGET)
+
+
+def turn_tokens(turn):
+    _, message, response = turn
+    return estimate_tokens(message) + estimate_tokens(response) + 2 * MESSAGE_OVERHEAD
+
+
+def summary_request(summary, turns):
+    # Messages asking a model to fold `turns` into `summary`; long turns are clipped
+    lines = [f"Existing summary:\n{summary or '(none)'}", "New exchanges:"]
+    for _, message, response in turns:
+        lines.append(f"User: {message[:SUMMARY_TURN_CHARS]}\nAssistant: {response[:SUMMARY_TURN_CHARS]}")
+    return [{"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": "\n\n".join(lines)}]
+
+
+def fold_backlog(username, room_id, summary, covered_id, before_id, summarize):
+    # Folds turns older than the recent window into the summary, oldest first and in bounded
+    # batches, so the summary watermark never moves past a turn that was not summarized.
+    # Returns (summary, covered_id, folded).
+    folded = 0
+    while summarize is not None:
+        batch = get_turns_between(username, room_id, covered_id, before_id, SUMMARY_BATCH_TURNS)
+        if not batch:
+            break
+        new_summary = summarize(summary, batch)
+        if not new_summary:
+            break
+        summary, covered_id = new_summary.strip(), batch[-1][0]
+        save_room_summary(room_id, summary, covered_id)
+        folded += len(batch)
+    return summary, covered_id, folded
+
+
+# Returns (messages, info) for sending `prompt` with as much of the room as fits.
+# The newest turns are packed verbatim up to the model's budget. Turns that fall out of
+# that window are folded into the room's cached summary by summarize(summary, turns),
+# which returns the new text (or None to leave the cache alone). Folding continues until
+# the window is down to half the budget, so the summary changes every few messages, not on each one.
+# Unsummarized turns older than the last MAX_CONTEXT_TURNS (e.g. rooms from before summaries
+# existed) are folded first, via fold_backlog; whatever can't be folded counts as dropped.
+def build_context(username, room_id, prompt, model, summarize=None):
+    budget = context_budget(model)
+    summary, covered_id = get_room_summary(room_id)
+    turns = get_recent_turns(username, room_id, after_id=covered_id, limit=MAX_CONTEXT_TURNS)
+    backlog_folded = backlog_dropped = 0
+    if len(turns) == MAX_CONTEXT_TURNS:
+        summary, covered_id, backlog_folded = fold_backlog(username, room_id, summary, covered_id, turns[0][0], summarize)
+        backlog_dropped = count_turns_between(username, room_id, covered_id, turns[0][0])
+    fixed = estimate_tokens(prompt) + MESSAGE_OVERHEAD
+    available = budget - fixed - (estimate_tokens(summary) + MESSAGE_OVERHEAD if summary else 0)
+
+    window_start = len(turns)
+    used = 0
+    while window_start > 0 and used + turn_tokens(turns[window_start - 1]) <= available:
+        window_start -= 1
+        used += turn_tokens(turns[window_start])
+
+    folded = 0
+    # With an unfolded backlog, moving the watermark past it would lose those turns for good
+    if window_start > 0 and summarize is not None and not backlog_dropped:
+        fold_end = window_start
+        while fold_end < len(turns) and used > available // 2:
+            used -= turn_tokens(turns[fold_end])
+            fold_end += 1
+        new_summary = summarize(summary, turns[:fold_end])
+        if new_summary:
+            summary = new_summary.strip()
+            save_room_summary(room_id, summary, turns[fold_end - 1][0])
+            window_start = folded = fold_end
+
+    messages = []
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    for _, message, response in turns[window_start:]:
+        messages.append({"role": "user", "content": message})
+        messages.append({"role": "assistant", "content": response})
+    messages.append({"role": "user", "content": prompt})
+
+    info = {
+        "budget": budget,
+        "prompt_tokens": sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages),
+        "turns": len(turns) - window_start,
+        "folded_turns": backlog_folded + folded,
+        # fell out of the window but could not be summarized
+        "dropped_turns": backlog_dropped + window_start - folded,
+        "summary_tokens": estimate_tokens(summary),
+    }
+    return messages, info
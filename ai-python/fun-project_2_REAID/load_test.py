@@ -0,0 +1,146 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+from mock_openrouter import MockSettings, start_server
+from openrouter_client import OpenRouterClient, OpenRouterError
+from storage_benchmark import percentile
+
+MODEL = "mistralai/mistral-7b-instruct"
+PROMPTS = ["Where should I go for a beach holiday in May?", "What are quiet mountain towns in Europe?",
+           "Plan three days in Kyoto on a budget.", "Which islands are good for snorkelling?"]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.counters = {"messages": 0, "failed_requests": 0, "lock_errors": 0}
+        self._lock = threading.Lock()
+
+    def record(self, op, seconds):
+        with self._lock:
+            self.latencies.setdefault(op, []).append(seconds * 1000)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def timed(self, op, fn, *args, **kwargs):
+        # A "database is locked" error means a writer waited out busy_timeout: count it, don't crash
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            self.count("lock_errors")
+            return None
+        finally:
+            self.record(op, time.perf_counter() - start)
+
+
+def complete(client, api_key, messages, stream):
+    # Returns (text, ttft_s, usage, status, retries); raises OpenRouterError on failure
+    if not stream:
+        data = client.chat(api_key, MODEL, messages, max_tokens=500)
+        return data["choices"][0]["message"]["content"], None, data.get("usage") or {}, 200, data["_retries"]
+    start = time.perf_counter()
+    ttft = None
+    chunks = []
+    response = client.stream_chat(api_key, MODEL, messages, max_tokens=500, usage={"include": True})
+    for delta in response:
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        chunks.append(delta)
+    return "".join(chunks), ttft, response.usage or {}, response.status_code, response.retries
+
+
+def simulate_user(index, client, args, recorder):
+    # One user's session: sign up, log in, open a room, then chat like chatbot_ui does
+    time.sleep(args.ramp_up * index / max(args.users, 1))
+    username, password = f"load-user-{index}", "LoadTest123"
+    recorder.timed("register_user", storage.register_user, username, password)
+    recorder.timed("login_user", storage.login_user, username, password)
+    room_id = recorder.timed("create_room", storage.create_room, username, "load test")
+    if room_id is None:
+        return
+    for n in range(args.messages):
+        recorder.timed("get_chat_history", storage.get_chat_history, username, room_id)
+        prompt = PROMPTS[(index + n) % len(PROMPTS)]
+        start = time.perf_counter()
+        telemetry = {}
+        try:
+            text, ttft, usage, status, retries = complete(client, "load-test-key", [{"role": "user", "content": prompt}],
+                                                          not args.blocking)
+            recorder.record("completion", time.perf_counter() - start)
+            if ttft is not None:
+                recorder.record("ttft", ttft)
+            telemetry = {"ttft_ms": ttft * 1000 if ttft is not None else None, "retries": retries,
+                         "prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+        except OpenRouterError as e:
+            recorder.count("failed_requests")
+            text, status = str(e), e.status_code
+        recorder.timed("store_chat", storage.store_chat, username, room_id, MODEL, prompt, text,
+                       latency_ms=(time.perf_counter() - start) * 1000, http_status=status, **telemetry)
+        recorder.count("messages")
+        if args.think_time:
+            time.sleep(args.think_time)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent chatbot users against a mock OpenRouter.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10, help="Messages per user")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pause between a user's messages")
+    parser.add_argument("--blocking", action="store_true", help="Use non-streaming completions")
+    parser.add_argument("--base-url", help="Existing server to target (default: start mock_openrouter in-process)")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock: seconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=100.0, help="Mock: generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock: share of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Mock: share of 429 responses")
+    parser.add_argument("--max-error-rate", type=float, default=0.05,
+                        help="Exit non-zero if more than this share of completions fail")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_server(MockSettings(latency=args.latency, tokens_per_s=args.tokens_per_s,
+                                                     error_rate=args.error_rate,
+                                                     rate_limit_rate=args.rate_limit_rate, retry_after=0))
+    client = OpenRouterClient(base_url=base_url, max_retries=3, backoff_base=0.05, pool_size=args.users)
+    recorder = Recorder()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, "load.db"))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            for future in [pool.submit(simulate_user, i, client, args, recorder) for i in range(args.users)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    print(f"{args.users} users x {args.messages} messages in {elapsed:.1f}s "
+          f"-> {recorder.counters['messages'] / elapsed:.1f} messages/s")
+    print(f"{'operation':<18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for op, values in recorder.latencies.items():
+        print(f"{op:<18} {len(values):>7} {percentile(values, 50):>9.1f} {percentile(values, 95):>9.1f} "
+              f"{percentile(values, 99):>9.1f} {max(values):>9.1f}")
+    client_stats = client.stats()
+    print(f"failed requests: {recorder.counters['failed_requests']}  retries: {client_stats['retries']}  "
+          f"connections opened: {client_stats['connections_opened']}  SQLite lock errors: {recorder.counters['lock_errors']}")
+
+    failure_rate = recorder.counters["failed_requests"] / max(recorder.counters["messages"], 1)
+    return 1 if recorder.counters["lock_errors"] or failure_rate > args.max_error_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/api/v1/chat/completions"
+WORDS = ("sunny beaches quiet mountains old towns street food museums hiking trails islands "
+         "night markets temples lakes vineyards castles coral reefs festivals").split()
+
+
+# Local stand-in for OpenRouter's chat completions endpoint, for load tests and offline work.
+# Point the app at it with OPENROUTER_BASE_URL=http://127.0.0.1:<port>/api/v1
+class MockSettings:
+    def __init__(self, latency=0.3, jitter=0.1, tokens_per_s=50.0, completion_tokens=60,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1, api_keys=None):
+        self.latency = latency                 # seconds before the first token
+        self.jitter = jitter                   # +/- uniform noise on latency
+        self.tokens_per_s = tokens_per_s       # generation speed after the first token (0 = instant)
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate           # share of requests answered with a 500
+        self.rate_limit_rate = rate_limit_rate  # share answered with a 429 + Retry-After
+        self.retry_after = retry_after
+        self.api_keys = api_keys               # accepted bearer keys; None accepts any (others get a 401)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    settings = MockSettings()
+    stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != COMPLETIONS_PATH:
+            return self._send_json(404, {"error": {"code": 404, "message": f"No route for {self.path}"}})
+        try:
+            payload = json.loads(body)
+            messages = payload["messages"]
+        except (ValueError, KeyError):
+            return self._send_json(400, {"error": {"code": 400, "message": "Invalid request body"}})
+
+        s = self.settings
+        self._count("requests")
+        if s.api_keys is not None and self.headers.get("Authorization") not in {f"Bearer {k}" for k in s.api_keys}:
+            return self._send_json(401, {"error": {"code": 401, "message": "No auth credentials found"}})
+        roll = random.random()
+        if roll < s.rate_limit_rate:
+            self._count("rate_limited")
+            return self._send_json(429, {"error": {"code": 429, "message": "Rate limited"}},
+                                   {"Retry-After": str(s.retry_after)})
+        if roll < s.rate_limit_rate + s.error_rate:
+            self._count("errors")
+            return self._send_json(500, {"error": {"code": 500, "message": "Injected failure"}})
+
+        time.sleep(max(0.0, s.latency + random.uniform(-s.jitter, s.jitter)))
+        completion_tokens = min(s.completion_tokens, int(payload.get("max_tokens") or s.completion_tokens))
+        tokens = [random.choice(WORDS) + " " for _ in range(completion_tokens)]
+        usage = {
+            "prompt_tokens": sum(len(m.get("content") or "") for m in messages) // 4,
+            "completion_tokens": completion_tokens,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = payload.get("model", "mock")
+        if payload.get("stream"):
+            self._count("streams")
+            self._stream(model, tokens, usage)
+        else:
+            if s.tokens_per_s:
+                time.sleep(len(tokens) / s.tokens_per_s)
+            self._send_json(200, {
+                "id": f"gen-{uuid.uuid4().hex}",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+    def _stream(self, model, tokens, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        generation_id = f"gen-{uuid.uuid4().hex}"
+        self._write_chunk(": OPENROUTER PROCESSING\n\n")
+        for token in tokens:
+            if self.settings.tokens_per_s:
+                time.sleep(1 / self.settings.tokens_per_s)
+            self._write_event({"id": generation_id, "model": model,
+                               "choices": [{"index": 0, "delta": {"content": token}}]})
+        self._write_event({"id": generation_id, "model": model,
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_event(self, data):
+        self._write_chunk(f"data: {json.dumps(data)}\n\n")
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    @classmethod
+    def _count(cls, name):
+        with cls.stats_lock:
+            cls.stats[name] += 1
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping a keep-alive connection (e.g. after an error response) is expected
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(settings=None, host="127.0.0.1", port=0):
+    # Serves on a daemon thread; returns (server, base_url). port=0 picks a free port.
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "settings": settings or MockSettings(),
+        "stats": dict.fromkeys(MockHandler.stats, 0),
+        "stats_lock": threading.Lock(),
+    })
+    server = MockServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local OpenRouter chat completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    args = parser.parse_args(argv)
+
+    settings = MockSettings(args.latency, args.jitter, args.tokens_per_s, args.completion_tokens,
+                            args.error_rate, args.rate_limit_rate)
+    server, base_url = start_server(settings, args.host, args.port)
+    print(f"Mock OpenRouter listening; set OPENROUTER_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import httpx
+
+from openrouter_client import RETRY_STATUSES, CircuitOpenError, OpenRouterError, parse_retry_after
+
+
+async def _complete(http, client, api_key, model, messages, params):
+    # One model's request, with the same retry/backoff and circuit-breaker rules as OpenRouterClient
+    breaker = client.breaker(model)
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload = {"model": model, "messages": messages, **params}
+    result = {"model": model, "content": "", "error": None, "status": None, "retries": 0,
+              "prompt_tokens": None, "completion_tokens": None}
+    start = time.perf_counter()
+    try:
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(model, breaker.retry_in())
+            retry_after = None
+            recorded = False
+            try:
+                response = await http.post(f"{client.base_url}/chat/completions", headers=headers, json=payload)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                recorded = True
+                error = OpenRouterError(0, f"{type(e).__name__}: {e}")
+            else:
+                breaker.record_status(response.status_code)
+                recorded = True
+                result["status"] = response.status_code
+                if response.status_code == 200:
+                    data = response.json()
+                    result["content"] = data["choices"][0]["message"]["content"]
+                    usage = data.get("usage") or {}
+                    result["prompt_tokens"] = usage.get("prompt_tokens")
+                    result["completion_tokens"] = usage.get("completion_tokens")
+                    break
+                error = OpenRouterError(response.status_code, response.text)
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            finally:
+                # Cancelled or failed without an answer: release a half-open trial
+                if not recorded:
+                    breaker.abort()
+
+            delay = client.backoff(result["retries"]) if retry_after is None else retry_after
+            if result["retries"] >= client.max_retries or delay > client.max_retry_after:
+                raise error
+            result["retries"] += 1
+            await asyncio.sleep(delay)
+    except OpenRouterError as e:
+        result["error"] = str(e)
+        result["status"] = e.status_code
+    except (KeyError, IndexError, ValueError) as e:
+        result["error"] = f"[Exception] {e}"
+    result["latency_s"] = time.perf_counter() - start
+    return result
+
+
+async def _fan_out(client, api_key, requests_by_model, params, on_result):
+    connect, read = client.timeout
+    timeout = httpx.Timeout(read, connect=connect)
+    limits = httpx.Limits(max_connections=max(len(requests_by_model), 1))
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        tasks = [asyncio.create_task(_complete(http, client, api_key, model, messages, params))
+                 for model, messages in requests_by_model.items()]
+        results = []
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return results
+
+
+def compare_models(client, api_key, requests_by_model, on_result=None, **params):
+    # Sends every model its messages at once and calls on_result(result) as each answer
+    # arrives, so the total wait is the slowest model rather than the sum of all of them.
+    # `client` supplies base URL, timeouts, retry limits and the shared per-model breakers.
+    start = time.perf_counter()
+    results = asyncio.run(_fan_out(client, api_key, requests_by_model, params, on_result))
+    return results, time.perf_counter() - start
@@ -0,0 +1,240 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OpenRouterError(Exception):
+    def __init__(self, status_code, body):
+        super().__init__(f"[Error {status_code}] {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+class CircuitOpenError(OpenRouterError):
+    def __init__(self, model, retry_in):
+        super().__init__(503, f"{model} is failing, not retrying for another {retry_in:.0f}s")
+
+
+# Per-model breaker: after `failure_threshold` consecutive failures the model is skipped
+# for `reset_timeout` seconds, then a single trial request decides whether it closes again.
+# Every attempt that passes allow() must end in record_status(), record_failure() or abort().
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                self.trial_started = now
+                return True
+            if self.state == "half-open" and now - self.trial_started >= self.reset_timeout:
+                # The trial never reported back (e.g. its thread died); let another one through
+                self.trial_started = now
+                return True
+            return False
+
+    def retry_in(self):
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_status(self, status_code):
+        # Any answer other than 429/5xx shows the model is reachable; a 4xx is the caller's
+        # fault (bad key, bad payload) and must not keep the breaker open
+        if status_code in RETRY_STATUSES:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def abort(self):
+        # An attempt ended without an answer (interrupted); a pending trial counts as failed
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class ChatStream:
+    # Iterates the content deltas of a streamed completion and records the final usage block
+    def __init__(self, response, retries):
+        self.response = response
+        self.status_code = response.status_code
+        self.retries = retries
+        self.usage = None
+
+    def __iter__(self):
+        try:
+            self.response.encoding = "utf-8"
+            for line in self.response.iter_lines(decode_unicode=True):
+                # Blank lines separate events; lines starting with ":" are keep-alive comments
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    return
+                chunk = json.loads(payload)
+                if "error" in chunk:
+                    error = chunk["error"]
+                    raise OpenRouterError(error.get("code", self.status_code), error.get("message", ""))
+                if chunk.get("usage"):
+                    self.usage = chunk["usage"]
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        finally:
+            self.response.close()
+
+
+# Process-wide OpenRouter client: one pooled keep-alive session, bounded timeouts,
+# jittered exponential backoff on 429/5xx (honouring Retry-After) and per-model breakers.
+class OpenRouterClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=5.0, read_timeout=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, max_retry_after=30.0, pool_size=32,
+                 breaker_threshold=5, breaker_reset=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0, "circuit_rejections": 0}
+
+    # ---- Public API ----
+    def chat(self, api_key, model, messages, **params):
+        response, retries = self._post(api_key, model, {"model": model, "messages": messages, **params})
+        with response:
+            data = response.json()
+        data["_retries"] = retries
+        return data
+
+    def stream_chat(self, api_key, model, messages, **params):
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        response, retries = self._post(api_key, model, payload, stream=True)
+        return ChatStream(response, retries)
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return self._breakers[model]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["open_circuits"] = [m for m, b in self._breakers.items() if b.state != "closed"]
+        connections = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                sent += pool.num_requests
+        stats["connections_opened"] = connections
+        stats["connections_reused"] = max(0, sent - connections)
+        return stats
+
+    # ---- Internals ----
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _post(self, api_key, model, payload, stream=False):
+        breaker = self.breaker(model)
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self._count("requests")
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count("circuit_rejections")
+                raise CircuitOpenError(model, breaker.retry_in())
+            self._count("attempts")
+            retry_after = None
+            recorded = False
+            try:
+                response = self.session.post(f"{self.base_url}/chat/completions", headers=headers,
+                                             json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                recorded = True
+                error = OpenRouterError(0, f"{type(e).__name__}: {e}")
+            else:
+                breaker.record_status(response.status_code)
+                recorded = True
+                if response.status_code == 200:
+                    return response, attempt
+                error = OpenRouterError(response.status_code, response.text)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    # 4xx other than 429 is our fault (bad key, bad payload), not the model's
+                    raise error
+            finally:
+                if not recorded:
+                    breaker.abort()
+
+            delay = self.backoff(attempt) if retry_after is None else retry_after
+            if attempt >= self.max_retries or delay > self.max_retry_after:
+                self._count("failures")
+                raise error
+            attempt += 1
+            self._count("retries")
+            time.sleep(delay)
+
+    def backoff(self, attempt):
+        # Full jitter keeps many sessions that failed together from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
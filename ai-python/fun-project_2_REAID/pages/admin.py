@@ -0,0 +1,53 @@
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from storage import error_rates, latency_percentiles, token_usage_by_user
+
+st.set_page_config(page_title="Chatbot Metrics", page_icon="📊", layout="wide")
+
+ADMIN_USERS = {u.strip() for u in os.environ.get("CHAT_ADMIN_USERS", "").split(",") if u.strip()}
+RANGES = {"Last 24 hours": timedelta(days=1), "Last 7 days": timedelta(days=7), "Last 30 days": timedelta(days=30)}
+
+if not st.session_state.get("logged_in"):
+    st.warning("Please log in on the chat page first.")
+    st.stop()
+if st.session_state.get("username") not in ADMIN_USERS:
+    st.error("This page is only available to admins (see CHAT_ADMIN_USERS).")
+    st.stop()
+
+st.title("📊 Chatbot Metrics")
+range_name = st.radio("Range", list(RANGES.keys()), index=1, horizontal=True)
+since = (datetime.now() - RANGES[range_name]).isoformat()
+# Hourly points for a single day, daily points otherwise
+bucket_chars = 13 if RANGES[range_name] <= timedelta(days=1) else 10
+
+# ---- Latency per model ----
+st.subheader("Latency per model")
+metric = st.radio("Measure", ["Request latency", "Time to first token"], horizontal=True)
+rows = latency_percentiles(since, bucket_chars, "latency_ms" if metric == "Request latency" else "ttft_ms")
+if rows:
+    latency = pd.DataFrame(rows, columns=["Model", "Bucket", "Requests", "p50 ms", "p95 ms"])
+    col1, col2 = st.columns(2)
+    col1.caption("p50 (ms)")
+    col1.line_chart(latency.pivot(index="Bucket", columns="Model", values="p50 ms"))
+    col2.caption("p95 (ms)")
+    col2.line_chart(latency.pivot(index="Bucket", columns="Model", values="p95 ms"))
+    with st.expander("Table"):
+        st.dataframe(latency, use_container_width=True, hide_index=True)
+else:
+    st.info("No requests with telemetry in this range yet.")
+
+# ---- Errors ----
+st.subheader("Error rates")
+rows = error_rates(since)
+st.dataframe(pd.DataFrame(rows, columns=["Model", "Requests", "Errors", "Error %", "Retries"]),
+             use_container_width=True, hide_index=True)
+
+# ---- Tokens ----
+st.subheader("Tokens per user")
+rows = token_usage_by_user(since)
+st.dataframe(pd.DataFrame(rows, columns=["User", "Requests", "Prompt tokens", "Completion tokens", "Total tokens"]),
+             use_container_width=True, hide_index=True)
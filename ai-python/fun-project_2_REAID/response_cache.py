@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+import threading
+
+from storage import get_cached_response, put_cached_response
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt):
+    # Case and whitespace differences ("Best beaches in Bali?" vs "best  beaches in bali?") hit the same entry
+    return " ".join(prompt.casefold().split())
+
+
+def make_key(model, prompt, temperature, max_tokens):
+    payload = json.dumps([model, normalize_prompt(prompt), round(float(temperature), 2), int(max_tokens)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Process-wide cache of complete responses, persisted in the response_cache table.
+# Keyed on model, prompt and generation parameters only (not the room's history), so it
+# is opt-in per user. Above `max_temperature` the caller wants varied answers and the
+# cache is bypassed.
+class ResponseCache:
+    def __init__(self, ttl_s=24 * 3600, max_entries=5000, max_temperature=0.8):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "saved_s": 0.0}
+
+    def cacheable(self, temperature):
+        return temperature <= self.max_temperature
+
+    def get(self, model, prompt, temperature, max_tokens):
+        if not self.cacheable(temperature):
+            self._count("bypassed")
+            return None
+        row = get_cached_response(make_key(model, prompt, temperature, max_tokens), self.ttl_s)
+        if row is None:
+            self._count("misses")
+            logger.info("response cache miss model=%s", model)
+            return None
+        response, latency_ms = row
+        self._count("hits")
+        self._count("saved_s", latency_ms / 1000)
+        logger.info("response cache hit model=%s saved=%.0fms", model, latency_ms)
+        return response, latency_ms
+
+    def put(self, model, prompt, temperature, max_tokens, response, latency_ms):
+        if not self.cacheable(temperature):
+            return
+        put_cached_response(make_key(model, prompt, temperature, max_tokens), model, response, latency_ms,
+                            self.ttl_s, self.max_entries)
+        self._count("stored")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["saved_s"] = round(stats["saved_s"], 2)
+        return stats
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
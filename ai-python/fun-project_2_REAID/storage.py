@@ -0,0 +1,538 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = os.environ.get("CHAT_DB_PATH", "chat_history.db")
+POOL_SIZE = 16
+BUSY_TIMEOUT_MS = 5000
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# ---- Migrations ----
+def _run_script(conn, script):
+    # executescript() would COMMIT first, which breaks the surrounding migration transaction,
+    # so statements are split (trigger bodies included) and run one at a time
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Only ever append to this list; existing databases replay just the missing steps.
+def _migration_base_tables(conn):
+    _run_script(conn, '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chat_rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            room_name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            room_id INTEGER,
+            model TEXT,
+            message TEXT,
+            response TEXT,
+            timestamp TEXT
+        );
+    ''')
+
+
+def _migration_indexes_and_cascade(conn):
+    # SQLite can't add a foreign key to an existing table, so chats is rebuilt.
+    # Rows whose room was already deleted were unreachable and are dropped.
+    _run_script(conn, '''
+        CREATE TABLE chats_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            room_id INTEGER REFERENCES chat_rooms(id) ON DELETE CASCADE,
+            model TEXT,
+            message TEXT,
+            response TEXT,
+            timestamp TEXT
+        );
+        INSERT INTO chats_new (id, username, room_id, model, message, response, timestamp)
+            SELECT id, username, room_id, model, message, response, timestamp FROM chats
+            WHERE room_id IN (SELECT id FROM chat_rooms);
+        DROP TABLE chats;
+        ALTER TABLE chats_new RENAME TO chats;
+        CREATE INDEX IF NOT EXISTS idx_chats_user_room ON chats(username, room_id, id);
+        CREATE INDEX IF NOT EXISTS idx_chats_room ON chats(room_id);
+        CREATE INDEX IF NOT EXISTS idx_chat_rooms_user ON chat_rooms(username, room_name);
+    ''')
+
+
+def _migration_chat_search(conn):
+    # External-content FTS5 index over chats: the text is stored once, in chats, and the
+    # triggers keep the index in step with every insert, update and (cascaded) delete.
+    # Prefix indexes keep search-as-you-type queries off a full term scan.
+    # 'rebuild' backfills the index from rows written before this migration.
+    _run_script(conn, '''
+        CREATE VIRTUAL TABLE chats_fts USING fts5(
+            message, response,
+            content='chats', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        );
+        CREATE TRIGGER chats_fts_insert AFTER INSERT ON chats BEGIN
+            INSERT INTO chats_fts(rowid, message, response) VALUES (new.id, new.message, new.response);
+        END;
+        CREATE TRIGGER chats_fts_delete AFTER DELETE ON chats BEGIN
+            INSERT INTO chats_fts(chats_fts, rowid, message, response) VALUES ('delete', old.id, old.message, old.response);
+        END;
+        CREATE TRIGGER chats_fts_update AFTER UPDATE OF message, response ON chats BEGIN
+            INSERT INTO chats_fts(chats_fts, rowid, message, response) VALUES ('delete', old.id, old.message, old.response);
+            INSERT INTO chats_fts(rowid, message, response) VALUES (new.id, new.message, new.response);
+        END;
+        INSERT INTO chats_fts(chats_fts) VALUES ('rebuild');
+    ''')
+
+
+def _migration_room_summaries(conn):
+    # Rolling summary of each room's older turns; last_chat_id is the newest chat folded in
+    _run_script(conn, '''
+        CREATE TABLE room_summaries (
+            room_id INTEGER PRIMARY KEY REFERENCES chat_rooms(id) ON DELETE CASCADE,
+            summary TEXT NOT NULL,
+            last_chat_id INTEGER NOT NULL,
+            updated_at TEXT
+        );
+    ''')
+
+
+def _migration_response_cache(conn):
+    _run_script(conn, '''
+        CREATE TABLE response_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            latency_ms REAL NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX idx_response_cache_last_used ON response_cache(last_used);
+    ''')
+
+
+def _migration_chat_telemetry(conn):
+    # Per-request metrics; NULL for rows written before this migration and for cache hits
+    _run_script(conn, '''
+        ALTER TABLE chats ADD COLUMN latency_ms REAL;
+        ALTER TABLE chats ADD COLUMN ttft_ms REAL;
+        ALTER TABLE chats ADD COLUMN prompt_tokens INTEGER;
+        ALTER TABLE chats ADD COLUMN completion_tokens INTEGER;
+        ALTER TABLE chats ADD COLUMN http_status INTEGER;
+        ALTER TABLE chats ADD COLUMN retries INTEGER;
+        CREATE INDEX idx_chats_timestamp ON chats(timestamp);
+    ''')
+
+
+def _migration_chat_search_username(conn):
+    # Rebuilds the search index with the owner's username as an extra column, so a search
+    # narrows to one user's rows inside FTS instead of ranking every user's matches first
+    _run_script(conn, '''
+        DROP TRIGGER chats_fts_insert;
+        DROP TRIGGER chats_fts_delete;
+        DROP TRIGGER chats_fts_update;
+        DROP TABLE chats_fts;
+        CREATE VIRTUAL TABLE chats_fts USING fts5(
+            message, response, username,
+            content='chats', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        );
+        CREATE TRIGGER chats_fts_insert AFTER INSERT ON chats BEGIN
+            INSERT INTO chats_fts(rowid, message, response, username) VALUES (new.id, new.message, new.response, new.username);
+        END;
+        CREATE TRIGGER chats_fts_delete AFTER DELETE ON chats BEGIN
+            INSERT INTO chats_fts(chats_fts, rowid, message, response, username) VALUES ('delete', old.id, old.message, old.response, old.username);
+        END;
+        CREATE TRIGGER chats_fts_update AFTER UPDATE OF message, response, username ON chats BEGIN
+            INSERT INTO chats_fts(chats_fts, rowid, message, response, username) VALUES ('delete', old.id, old.message, old.response, old.username);
+            INSERT INTO chats_fts(rowid, message, response, username) VALUES (new.id, new.message, new.response, new.username);
+        END;
+        INSERT INTO chats_fts(chats_fts) VALUES ('rebuild');
+    ''')
+
+
+def _migration_chat_search_username_key(conn):
+    # A username made only of punctuation has no unicode61 tokens, so it could never be matched.
+    # The index now holds hex(username) instead, via a generated column: always exactly one token
+    # per user. The column is virtual, so chats stores nothing extra.
+    _run_script(conn, '''
+        ALTER TABLE chats ADD COLUMN username_key TEXT GENERATED ALWAYS AS (hex(username)) VIRTUAL;
+        DROP TRIGGER chats_fts_insert;
+        DROP TRIGGER chats_fts_delete;
+        DROP TRIGGER chats_fts_update;
+        DROP TABLE chats_fts;
+        CREATE VIRTUAL TABLE chats_fts USING fts5(
+            message, response, username_key,
+            content='chats', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        );
+        CREATE TRIGGER chats_fts_insert AFTER INSERT ON chats BEGIN
+            INSERT INTO chats_fts(rowid, message, response, username_key) VALUES (new.id, new.message, new.response, new.username_key);
+        END;
+        CREATE TRIGGER chats_fts_delete AFTER DELETE ON chats BEGIN
+            INSERT INTO chats_fts(chats_fts, rowid, message, response, username_key) VALUES ('delete', old.id, old.message, old.response, old.username_key);
+        END;
+        CREATE TRIGGER chats_fts_update AFTER UPDATE OF message, response, username ON chats BEGIN
+            INSERT INTO chats_fts(chats_fts, rowid, message, response, username_key) VALUES ('delete', old.id, old.message, old.response, old.username_key);
+            INSERT INTO chats_fts(rowid, message, response, username_key) VALUES (new.id, new.message, new.response, new.username_key);
+        END;
+        INSERT INTO chats_fts(chats_fts) VALUES ('rebuild');
+    ''')
+
+
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_indexes_and_cascade,
+    _migration_chat_search,
+    _migration_room_summaries,
+    _migration_response_cache,
+    _migration_chat_telemetry,
+    _migration_chat_search_username,
+    _migration_chat_search_username_key,
+]
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    # Table rebuilds need foreign keys off; each step commits together with its version bump
+    conn.execute("PRAGMA foreign_keys=OFF")
+    for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the write lock
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                conn.execute("ROLLBACK")
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version={target}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    conn.execute("PRAGMA foreign_keys=ON")
+
+
+# ---- Connection pool ----
+class ConnectionPool:
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+        conn = self._connect()
+        # WAL lets readers run alongside a writer; the mode is stored in the database file
+        conn.execute("PRAGMA journal_mode=WAL")
+        migrate(conn)
+        self._idle.put(conn)
+
+    def _connect(self):
+        # Autocommit mode: every write goes through transaction() and stays short
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # A connection is used by one thread at a time and returned to the pool afterwards
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+
+def get_pool(db_path=None):
+    db_path = db_path or DB_PATH
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
+
+
+def configure(db_path):
+    global DB_PATH
+    DB_PATH = db_path
+
+
+@contextmanager
+def connection():
+    with get_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction():
+    # IMMEDIATE takes the write lock up front, so concurrent writers queue on busy_timeout
+    # instead of failing with "database is locked" when upgrading from a read
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+# ---- Users ----
+def register_user(username, password):
+    if not username or not password:
+        return False, "Username and password cannot be empty."
+    if not re.match(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).+$', password):
+        return False, "Password must have at least 1 uppercase, 1 lowercase, 1 number, and not empty."
+    try:
+        with transaction() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+        return True, "Registered successfully."
+    except sqlite3.IntegrityError:
+        return False, "Username already taken."
+
+
+def login_user(username, password):
+    if not username or not password:
+        return False, "Username and password cannot be empty."
+    with connection() as conn:
+        row = conn.execute("SELECT 1 FROM users WHERE username=? AND password=?", (username, password)).fetchone()
+    if row:
+        return True, "Login successful."
+    else:
+        return False, "Invalid credentials."
+
+
+# ---- Rooms ----
+def create_room(username, room_name):
+    with transaction() as conn:
+        return conn.execute("INSERT INTO chat_rooms (username, room_name) VALUES (?, ?)", (username, room_name)).lastrowid
+
+
+def room_exists(username, room_name):
+    with connection() as conn:
+        row = conn.execute("SELECT 1 FROM chat_rooms WHERE username = ? AND room_name = ?", (username, room_name.strip())).fetchone()
+    return row is not None
+
+
+def get_rooms(username):
+    with connection() as conn:
+        return conn.execute("SELECT id, room_name FROM chat_rooms WHERE username=?", (username,)).fetchall()
+
+
+def delete_room(room_id):
+    # The room's chats go with it through ON DELETE CASCADE
+    with transaction() as conn:
+        conn.execute("DELETE FROM chat_rooms WHERE id=?", (room_id,))
+
+
+# ---- Chats ----
+def store_chat(username, room_id, model, message, response, latency_ms=None, ttft_ms=None, prompt_tokens=None,
+               completion_tokens=None, http_status=None, retries=None):
+    with transaction() as conn:
+        return conn.execute('''
+            INSERT INTO chats (username, room_id, model, message, response, timestamp, latency_ms, ttft_ms,
+                               prompt_tokens, completion_tokens, http_status, retries)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (username, room_id, model, message, response, datetime.now().isoformat(), latency_ms, ttft_ms,
+              prompt_tokens, completion_tokens, http_status, retries)).lastrowid
+
+
+def store_chats(rows):
+    # Batched variant of store_chat: (username, room_id, model, message, response) tuples in one transaction
+    timestamp = datetime.now().isoformat()
+    with transaction() as conn:
+        conn.executemany("INSERT INTO chats (username, room_id, model, message, response, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                         [(*row, timestamp) for row in rows])
+
+
+def get_chat_history(username, room_id):
+    with connection() as conn:
+        return conn.execute("SELECT model, message, response, timestamp FROM chats WHERE username=? AND room_id=? ORDER BY id ASC", (username, room_id)).fetchall()
+
+
+def get_chat_page(username, room_id, before_id=None, after_id=None, limit=None):
+    # Keyset pagination on chats.id, returned oldest first: either every row newer than
+    # after_id, or the newest `limit` rows older than before_id
+    with connection() as conn:
+        if after_id is not None:
+            return conn.execute("SELECT id, model, message, response, timestamp FROM chats WHERE username=? AND room_id=? AND id>? ORDER BY id ASC", (username, room_id, after_id)).fetchall()
+        if before_id is None:
+            rows = conn.execute("SELECT id, model, message, response, timestamp FROM chats WHERE username=? AND room_id=? ORDER BY id DESC LIMIT ?", (username, room_id, limit)).fetchall()
+        else:
+            rows = conn.execute("SELECT id, model, message, response, timestamp FROM chats WHERE username=? AND room_id=? AND id<? ORDER BY id DESC LIMIT ?", (username, room_id, before_id, limit)).fetchall()
+    return rows[::-1]
+
+
+def get_recent_turns(username, room_id, after_id=0, limit=100):
+    # The newest `limit` exchanges with id > after_id, oldest first
+    with connection() as conn:
+        rows = conn.execute("SELECT id, message, response FROM chats WHERE username=? AND room_id=? AND id>? ORDER BY id DESC LIMIT ?", (username, room_id, after_id, limit)).fetchall()
+    return rows[::-1]
+
+
+def get_turns_between(username, room_id, after_id, before_id, limit=20):
+    # The oldest `limit` exchanges with after_id < id < before_id, oldest first
+    with connection() as conn:
+        return conn.execute("SELECT id, message, response FROM chats WHERE username=? AND room_id=? AND id>? AND id<? ORDER BY id LIMIT ?", (username, room_id, after_id, before_id, limit)).fetchall()
+
+
+def count_turns_between(username, room_id, after_id, before_id):
+    with connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM chats WHERE username=? AND room_id=? AND id>? AND id<?", (username, room_id, after_id, before_id)).fetchone()[0]
+
+
+def clear_chat_history(username, room_id):
+    with transaction() as conn:
+        conn.execute("DELETE FROM chats WHERE username=? AND room_id=?", (username, room_id))
+        conn.execute("DELETE FROM room_summaries WHERE room_id=?", (room_id,))
+
+
+# ---- Summaries ----
+def get_room_summary(room_id):
+    with connection() as conn:
+        row = conn.execute("SELECT summary, last_chat_id FROM room_summaries WHERE room_id=?", (room_id,)).fetchone()
+    return row if row else ("", 0)
+
+
+def save_room_summary(room_id, summary, last_chat_id):
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO room_summaries (room_id, summary, last_chat_id, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(room_id) DO UPDATE SET summary=excluded.summary, last_chat_id=excluded.last_chat_id,
+                                               updated_at=excluded.updated_at
+        ''', (room_id, summary, last_chat_id, datetime.now().isoformat()))
+
+
+# ---- Search ----
+def fts_query(text):
+    # Turn free text into an FTS5 query: every word must match, the last one as a prefix
+    # (so results appear while typing). Quoting keeps operators like - or : literal.
+    words = [w.replace('"', '""') for w in text.split()]
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words) + "*"
+
+
+def search_chats(username, text, limit=20):
+    # Ranked (bm25) matches across all of the user's rooms, with highlighted snippets.
+    # Matching on the hex username key keeps the search to this user's rows inside the index.
+    query = fts_query(text)
+    if query is None:
+        return []
+    query = f'username_key:"{username.encode("utf-8").hex()}" AND {{message response}}:({query})'
+    with connection() as conn:
+        return conn.execute('''
+            SELECT chats.id, chats.room_id, chat_rooms.room_name, chats.model,
+                   snippet(chats_fts, 0, '**', '**', '…', 12),
+                   snippet(chats_fts, 1, '**', '**', '…', 12),
+                   chats.timestamp
+            FROM chats_fts
+            JOIN chats ON chats.id = chats_fts.rowid
+            JOIN chat_rooms ON chat_rooms.id = chats.room_id
+            WHERE chats_fts MATCH ? AND chats.username = ?
+            ORDER BY bm25(chats_fts, 1.0, 1.0, 0.0)
+            LIMIT ?
+        ''', (query, username, limit)).fetchall()
+
+
+# ---- Response cache ----
+def get_cached_response(key, max_age_s):
+    # Returns (response, latency_ms) for a fresh entry and marks it as recently used
+    now = time.time()
+    with transaction() as conn:
+        row = conn.execute("SELECT response, latency_ms FROM response_cache WHERE key=? AND created_at>=?",
+                           (key, now - max_age_s)).fetchone()
+        if row:
+            conn.execute("UPDATE response_cache SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+    return row
+
+
+def put_cached_response(key, model, response, latency_ms, max_age_s, max_entries):
+    # Stores an entry, then drops expired ones and the least recently used beyond max_entries
+    now = time.time()
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO response_cache (key, model, response, latency_ms, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                     (key, model, response, latency_ms, now, now))
+        conn.execute("DELETE FROM response_cache WHERE created_at<?", (now - max_age_s,))
+        conn.execute("DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                     (max_entries,))
+
+
+# ---- Metrics ----
+# Aggregates for the admin page, computed in SQL so only summary rows leave the database.
+# `since` is an ISO timestamp; `bucket_chars` truncates timestamps (10 = day, 13 = hour).
+def latency_percentiles(since, bucket_chars=10, column="latency_ms"):
+    if column not in ("latency_ms", "ttft_ms"):
+        raise ValueError(f"Unknown latency column: {column}")
+    with connection() as conn:
+        return conn.execute(f'''
+            WITH ranked AS (
+                SELECT model, substr(timestamp, 1, ?) AS bucket, {column} AS value,
+                       CUME_DIST() OVER (PARTITION BY model, substr(timestamp, 1, ?) ORDER BY {column}) AS cd
+                FROM chats
+                WHERE timestamp >= ? AND {column} IS NOT NULL
+            )
+            SELECT model, bucket, COUNT(*),
+                   MIN(CASE WHEN cd >= 0.5 THEN value END),
+                   MIN(CASE WHEN cd >= 0.95 THEN value END)
+            FROM ranked
+            GROUP BY model, bucket
+            ORDER BY bucket, model
+        ''', (bucket_chars, bucket_chars, since)).fetchall()
+
+
+def error_rates(since):
+    with connection() as conn:
+        return conn.execute('''
+            SELECT model, COUNT(*),
+                   SUM(http_status != 200),
+                   ROUND(100.0 * SUM(http_status != 200) / COUNT(*), 2),
+                   SUM(retries)
+            FROM chats
+            WHERE timestamp >= ? AND http_status IS NOT NULL
+            GROUP BY model
+            ORDER BY 4 DESC
+        ''', (since,)).fetchall()
+
+
+def token_usage_by_user(since):
+    with connection() as conn:
+        return conn.execute('''
+            SELECT username, COUNT(*),
+                   COALESCE(SUM(prompt_tokens), 0),
+                   COALESCE(SUM(completion_tokens), 0),
+                   COALESCE(SUM(prompt_tokens), 0) + COALESCE(SUM(completion_tokens), 0) AS total
+            FROM chats
+            WHERE timestamp >= ? AND http_status IS NOT NULL
+            GROUP BY username
+            ORDER BY total DESC
+        ''', (since,)).fetchall()
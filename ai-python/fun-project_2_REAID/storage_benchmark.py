@@ -0,0 +1,111 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import storage
+
+HISTORY_PAGE_SIZE = 30
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Worker(threading.Thread):
+    def __init__(self, target, stop):
+        super().__init__(daemon=True)
+        self._target_fn = target
+        self._stop_event = stop
+        self.latencies = []
+        self.ops = 0
+        self.lock_errors = 0
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                self.ops += self._target_fn()
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                self.lock_errors += 1
+                continue
+            self.latencies.append(time.perf_counter() - start)
+
+
+def make_writer(username, room_id, batch):
+    def write():
+        if batch > 1:
+            storage.store_chats([(username, room_id, "bench", "question", "answer " * 40)] * batch)
+            return batch
+        storage.store_chat(username, room_id, "bench", "question", "answer " * 40)
+        return 1
+    return write
+
+
+def make_reader(username, room_id):
+    def read():
+        storage.get_chat_page(username, room_id, limit=HISTORY_PAGE_SIZE)
+        return 1
+    return read
+
+
+def summarize(name, workers, elapsed):
+    latencies = [l * 1000 for w in workers for l in w.latencies]
+    ops = sum(w.ops for w in workers)
+    return {
+        "name": name,
+        "ops_per_s": round(ops / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "lock_errors": sum(w.lock_errors for w in workers),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent write/read benchmark for the chat storage layer.")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run")
+    parser.add_argument("--batch", type=int, default=1, help="Rows per write transaction (store_chats when > 1)")
+    parser.add_argument("--seed-rows", type=int, default=5000, help="History rows per room before the run")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, "bench.db"))
+        rooms = []
+        for i in range(max(args.writers, 1)):
+            username = f"user{i}"
+            storage.register_user(username, "Bench123")
+            room_id = storage.create_room(username, "bench")
+            storage.store_chats([(username, room_id, "bench", "question", "answer")] * args.seed_rows)
+            rooms.append((username, room_id))
+
+        stop = threading.Event()
+        writers = [Worker(make_writer(*rooms[i % len(rooms)], args.batch), stop) for i in range(args.writers)]
+        readers = [Worker(make_reader(*rooms[i % len(rooms)]), stop) for i in range(args.readers)]
+        start = time.perf_counter()
+        for worker in writers + readers:
+            worker.start()
+        time.sleep(args.duration)
+        stop.set()
+        for worker in writers + readers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+    results = [summarize("writes", writers, elapsed), summarize("reads", readers, elapsed)]
+    print(f"{'ops':<8} {'per s':>10} {'p50 ms':>9} {'p95 ms':>9} {'locked':>7}")
+    for r in results:
+        print(f"{r['name']:<8} {r['ops_per_s']:>10} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['lock_errors']:>7}")
+    return 1 if any(r["lock_errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
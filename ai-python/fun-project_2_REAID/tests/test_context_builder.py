@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from context_builder import build_context  # noqa: E402
+
+MODEL = "mistralai/mistral-7b-instruct"
+
+
+class BuildContextTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        storage.configure(os.path.join(self.tmp.name, "test.db"))
+        storage.register_user("alice", "Password123")
+        self.room_id = storage.create_room("alice", "legacy")
+        # A room from before summaries existed: far more unsummarized turns than one window
+        storage.store_chats([("alice", self.room_id, MODEL, f"question {i} " + "x" * 80, f"answer {i}")
+                             for i in range(1, 301)])
+        self.folded_ids = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def summarize(self, summary, turns):
+        self.folded_ids.extend(turn_id for turn_id, _, _ in turns)
+        return f"summary up to {turns[-1][0]}"
+
+    def test_backlog_is_folded_oldest_first(self):
+        messages, info = build_context("alice", self.room_id, "next?", MODEL, summarize=self.summarize)
+        _, covered_id = storage.get_room_summary(self.room_id)
+        first_sent = int(messages[1]["content"].split()[1])
+        self.assertEqual(self.folded_ids, list(range(1, covered_id + 1)))
+        self.assertEqual(first_sent, covered_id + 1)
+        self.assertEqual(info["folded_turns"], covered_id)
+        self.assertEqual(info["dropped_turns"], 0)
+
+    def test_unfolded_backlog_counts_as_dropped(self):
+        messages, info = build_context("alice", self.room_id, "next?", MODEL)
+        self.assertEqual(storage.get_room_summary(self.room_id), ("", 0))
+        self.assertEqual(info["folded_turns"], 0)
+        self.assertEqual(info["dropped_turns"], 300 - info["turns"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_openrouter import MockSettings, start_server  # noqa: E402
+from model_compare import compare_models  # noqa: E402
+from openrouter_client import OpenRouterClient  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class CompareBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = MockSettings(latency=0, jitter=0, tokens_per_s=0, completion_tokens=3,
+                                     api_keys={"good-key"})
+        self.server, base_url = start_server(self.settings)
+        self.client = OpenRouterClient(base_url=base_url, max_retries=0, breaker_threshold=1, breaker_reset=0.2)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def statuses(self, api_key):
+        results, _ = compare_models(self.client, api_key, {"a": MESSAGES, "b": MESSAGES})
+        return sorted(r["status"] for r in results)
+
+    def test_4xx_trial_closes_breaker(self):
+        self.settings.error_rate = 1.0
+        self.assertEqual(self.statuses("good-key"), [500, 500])
+        self.settings.error_rate = 0.0
+        self.assertEqual(self.statuses("good-key"), [503, 503])  # circuit open
+        time.sleep(0.25)
+        self.assertEqual(self.statuses("bad-key"), [401, 401])
+        self.assertEqual(self.client.breaker("a").state, "closed")
+        self.assertEqual(self.statuses("good-key"), [200, 200])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_openrouter import MockSettings, start_server  # noqa: E402
+from openrouter_client import CircuitOpenError, OpenRouterClient, OpenRouterError  # noqa: E402
+
+MODEL = "mock/model"
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = MockSettings(latency=0, jitter=0, tokens_per_s=0, completion_tokens=3,
+                                     api_keys={"good-key"})
+        self.server, base_url = start_server(self.settings)
+        self.client = OpenRouterClient(base_url=base_url, max_retries=0, breaker_threshold=1, breaker_reset=0.2)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def open_breaker(self):
+        self.settings.error_rate = 1.0
+        with self.assertRaises(OpenRouterError):
+            self.client.chat("good-key", MODEL, MESSAGES)
+        self.settings.error_rate = 0.0
+        self.assertEqual(self.client.breaker(MODEL).state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.client.chat("good-key", MODEL, MESSAGES)
+        time.sleep(0.25)
+
+    def test_4xx_trial_closes_breaker(self):
+        self.open_breaker()
+        with self.assertRaises(OpenRouterError) as ctx:
+            self.client.chat("bad-key", MODEL, MESSAGES)
+        self.assertEqual(ctx.exception.status_code, 401)
+        self.assertEqual(self.client.breaker(MODEL).state, "closed")
+        self.assertIn("choices", self.client.chat("good-key", MODEL, MESSAGES))
+
+    def test_5xx_trial_reopens_breaker(self):
+        self.open_breaker()
+        self.settings.error_rate = 1.0
+        with self.assertRaises(OpenRouterError):
+            self.client.chat("good-key", MODEL, MESSAGES)
+        self.assertEqual(self.client.breaker(MODEL).state, "open")
+
+    def test_interrupted_trial_reopens_breaker(self):
+        self.open_breaker()
+
+        def interrupt(*args, **kwargs):
+            raise KeyboardInterrupt
+        post, self.client.session.post = self.client.session.post, interrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.client.chat("good-key", MODEL, MESSAGES)
+        self.client.session.post = post
+        breaker = self.client.breaker(MODEL)
+        self.assertEqual(breaker.state, "open")
+        time.sleep(0.25)
+        self.assertIn("choices", self.client.chat("good-key", MODEL, MESSAGES))
+        self.assertEqual(breaker.state, "closed")
+
+    def test_unreported_trial_expires(self):
+        breaker = self.client.breaker(MODEL)
+        self.open_breaker()
+        self.assertTrue(breaker.allow())   # trial handed out, never reported
+        self.assertFalse(breaker.allow())
+        time.sleep(0.25)
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+class StorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        storage.configure(os.path.join(self.tmp.name, "test.db"))
+        storage.register_user("alice", "Password123")
+        self.room_id = storage.create_room("alice", "test")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_latency_percentiles_use_nearest_rank(self):
+        storage.store_chat("alice", self.room_id, "single", "q", "a", latency_ms=15)
+        for latency in (40, 10, 30, 20):
+            storage.store_chat("alice", self.room_id, "four", "q", "a", latency_ms=latency)
+        rows = {row[0]: row[2:] for row in storage.latency_percentiles("2000-01-01")}
+        self.assertEqual(rows["single"], (1, 15, 15))
+        self.assertEqual(rows["four"], (4, 20, 40))
+
+    def test_search_only_returns_own_matches(self):
+        storage.register_user("alice-b", "Password123")
+        other_room = storage.create_room("alice-b", "other")
+        storage.store_chat("alice", self.room_id, "m", "beaches in May", "try Crete")
+        storage.store_chat("alice-b", other_room, "m", "beaches in June", "try Malta")
+        storage.store_chat("alice", self.room_id, "m", "mountains", "ask alice")
+        results = storage.search_chats("alice", "beach")
+        self.assertEqual([row[4] for row in results], ["**beaches** in May"])
+        # The username column is only used for filtering, never as search text
+        self.assertEqual([row[5] for row in storage.search_chats("alice", "alice")], ["ask **alice**"])
+
+    def test_search_with_quotes_in_username(self):
+        storage.register_user('bob "the" builder', "Password123")
+        room_id = storage.create_room('bob "the" builder', "r")
+        storage.store_chat('bob "the" builder', room_id, "m", "hello there", "hi")
+        self.assertEqual(len(storage.search_chats('bob "the" builder', "hel")), 1)
+
+    def test_search_with_untokenizable_username(self):
+        for username in ("!!!", "李雷"):
+            storage.register_user(username, "Password123")
+            room_id = storage.create_room(username, "r")
+            storage.store_chat(username, room_id, "m", "hello there", "hi")
+            self.assertEqual([row[4] for row in storage.search_chats(username, "hel")], ["**hello** there"])
+
+
+if __name__ == "__main__":
+    unittest.main()